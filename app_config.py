@@ -0,0 +1,123 @@
+"""Runtime configuration for the POS backend (generate_qrcode_api)."""
+import json
+import os
+import tempfile
+
+
+class Config:
+    """
+    Settings consumed by ``create_app``.
+
+    Class attributes hold the defaults; keyword arguments override them per
+    instance so tests can build an app without touching the environment.
+    ``from_env`` is the production entry point and is the only place that
+    reads ``.env``.
+    """
+
+    IRIS_ACCESS_TOKEN = ""
+    API_KEY = ""
+
+    # Verifier endpoints: list of {"name", "url", "token"}; empty means the
+    # sandbox verifier with IRIS_ACCESS_TOKEN. See verifier_pool.VerifierPool.
+    VERIFIER_ENDPOINTS = []
+    VERIFIER_TIMEOUT = 10.0
+    VERIFIER_POOL_SIZE = 10
+    VERIFIER_EJECT_AFTER = 3
+    VERIFIER_EJECT_SECONDS = 30.0
+
+    # Security: CORS - only allow local development origins
+    CORS_ORIGINS = ["http://localhost:*", "http://127.0.0.1:*"]
+
+    # Security: Rate limiting to prevent abuse
+    RATELIMIT_ENABLED = True
+    RATELIMIT_STORAGE_URI = "memory://"
+    RATELIMIT_DEFAULT = ["200 per day", "50 per hour"]
+
+    # Transaction journal (disabled when JOURNAL_PATH is empty)
+    JOURNAL_PATH = None
+    JOURNAL_BATCH_SIZE = 64
+    JOURNAL_FLUSH_INTERVAL = 1.0
+
+    # Cross-worker store (idempotency keys, endpoint pins);
+    # every worker must use the same path. The default lives in a per-user
+    # 0700 directory and the file is created 0600.
+    SHARED_STORE_PATH = os.path.join(
+        tempfile.gettempdir(),
+        f"uuse-{os.getuid()}" if hasattr(os, "getuid") else "uuse",
+        "shared_store.sqlite3",
+    )
+    SHARED_STORE_MAX_ENTRIES = 10000
+
+    # Idempotency-Key on /api/generate_by_ref: responses are replayed for the
+    # QR validity window (5 minutes). The first request's claim is renewed every
+    # third of the lock time while it runs; duplicates wait up to the lock time
+    # (twice) for it before answering 409
+    IDEMPOTENCY_TTL_SECONDS = 300
+    IDEMPOTENCY_LOCK_SECONDS = 30
+
+    # authUri of each new transaction, kept in the shared store so that
+    # /view/qrcode works on any worker
+    QRCODE_TTL_SECONDS = 600
+
+    # Verified (final) results are cached in each worker's memory for this
+    # long (they hold credential claims, so never on disk); /view/result
+    # derives its ETag from them
+    RESULT_CACHE_TTL_SECONDS = 600
+    RESULT_CACHE_MAX_ENTRIES = 1000
+
+    # On-demand request profiling (request_profiler.py); off unless PROFILE_DIR
+    # is set. A request is profiled when it sends X-Profile-Token matching
+    # PROFILE_TOKEN, or at random with probability PROFILE_SAMPLE_RATE.
+    PROFILE_DIR = None
+    PROFILE_TOKEN = ""
+    PROFILE_SAMPLE_RATE = 0.0
+    PROFILE_INTERVAL = 0.001
+
+    # Span tracing (tracing.py), exported as Zipkin v2 JSON to a local file
+    # or a collector; off when neither is set
+    TRACE_EXPORT_PATH = None
+    TRACE_COLLECTOR_URL = None
+    TRACE_SERVICE_NAME = "uuse-pos"
+    TRACE_SAMPLE_RATE = 1.0
+
+    def __init__(self, **overrides):
+        for key, value in overrides.items():
+            if not key.isupper():
+                raise TypeError(f"Config keys must be upper case: {key!r}")
+            setattr(self, key, value)
+
+    @classmethod
+    def from_env(cls, dotenv_path=None):
+        """Build a config from environment variables (loading ``.env`` first)."""
+        from dotenv import load_dotenv
+
+        load_dotenv(dotenv_path)
+        return cls(
+            IRIS_ACCESS_TOKEN=os.getenv("IRIS_ACCESS_TOKEN", ""),
+            VERIFIER_ENDPOINTS=json.loads(os.getenv("VERIFIER_ENDPOINTS", "") or "[]"),
+            API_KEY=os.getenv("API_KEY", ""),
+            RATELIMIT_STORAGE_URI=os.getenv("RATELIMIT_STORAGE_URL", cls.RATELIMIT_STORAGE_URI),
+            JOURNAL_PATH=os.getenv("TRANSACTION_JOURNAL_PATH", "logs/transactions.jsonl"),
+            SHARED_STORE_PATH=os.getenv("SHARED_STORE_PATH", cls.SHARED_STORE_PATH),
+            TRACE_EXPORT_PATH=os.getenv("TRACE_EXPORT_PATH") or None,
+            TRACE_COLLECTOR_URL=os.getenv("TRACE_COLLECTOR_URL") or None,
+            TRACE_SAMPLE_RATE=float(os.getenv("TRACE_SAMPLE_RATE", "1") or 1),
+            PROFILE_DIR=os.getenv("PROFILE_DIR") or None,
+            PROFILE_TOKEN=os.getenv("PROFILE_TOKEN", ""),
+            PROFILE_SAMPLE_RATE=float(os.getenv("PROFILE_SAMPLE_RATE", "0") or 0),
+        )
+
+    def validate(self):
+        """Raise ValueError when a required setting is missing."""
+        endpoints = self.VERIFIER_ENDPOINTS or []
+        for endpoint in endpoints:
+            if not isinstance(endpoint, dict) or not endpoint.get("url"):
+                raise ValueError("Each VERIFIER_ENDPOINTS entry needs a \"url\".")
+        if not self.IRIS_ACCESS_TOKEN and not (endpoints and all(ep.get("token") for ep in endpoints)):
+            raise ValueError("IRIS_ACCESS_TOKEN not found in environment variables. Please set it in .env file.")
+        if not self.API_KEY:
+            raise ValueError("API_KEY not found in environment variables. Please set it in .env file.")
+
+    def as_dict(self):
+        """Return every upper-case setting (defaults included) for ``app.config``."""
+        return {key: getattr(self, key) for key in dir(self) if key.isupper()}
@@ -0,0 +1,62 @@
+"""
+Compare local QR rendering (qr_render) with the verifier's qrcodeImage.
+
+Reports render time (cold and cached) and output size for each size/format
+variant next to the cost of decoding the upstream base64 image. Pass a saved
+upstream response to compare against real data:
+
+    python benchmarks/bench_qr_render.py --upstream-json response.json
+    python benchmarks/bench_qr_render.py --auth-uri "modadigitalwallet://..." --sizes 128 256 512
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_qrcode import decode_base64_image  # noqa: E402
+from qr_render import FORMATS, _render_cached, render_qr  # noqa: E402
+
+# Representative deep link (same shape/length as the sandbox authUri)
+_SAMPLE_AUTH_URI = (
+    "modadigitalwallet://authorize?client_id=did:key:z6MkhaXgBZDvotDkL5257faiztiGiC2QtKLGpbnnEGta2doK"
+    "&request_uri=https://verifier-sandbox.wallet.gov.tw/api/oidvp/request/3f2c9b1e-6a0d-4c1e-9b7a-2d4f8e6c1a90"
+)
+
+
+def _timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--upstream-json", help="saved /api/oidvp/qrcode response (qrcodeImage + authUri)")
+    parser.add_argument("--auth-uri", default=None)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[128, 256, 512])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    auth_uri = args.auth_uri or _SAMPLE_AUTH_URI
+    print(f"{'variant':<16}{'size':>8}{'cold ms':>12}{'cached ms':>12}{'bytes':>10}")
+    if args.upstream_json:
+        with open(args.upstream_json, "r", encoding="utf-8") as f:
+            upstream = json.load(f)
+        auth_uri = args.auth_uri or upstream["authUri"]
+        b64 = upstream["qrcodeImage"]
+        decode_s, image = _timed(lambda: decode_base64_image(b64), args.repeat)
+        print(f"{'upstream png':<16}{'-':>8}{decode_s * 1000:>12.3f}{'-':>12}{len(image):>10}  (base64 on wire: {len(b64)} B)")
+    for fmt in sorted(FORMATS):
+        for size in args.sizes:
+            _render_cached.cache_clear()
+            cold_s, image = _timed(lambda: (_render_cached.cache_clear(), render_qr(auth_uri, size, fmt))[1], args.repeat)
+            cached_s, _ = _timed(lambda: render_qr(auth_uri, size, fmt), args.repeat)
+            print(f"{'local ' + fmt:<16}{size:>8}{cold_s * 1000:>12.3f}{cached_s * 1000:>12.4f}{len(image):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Measure import and boot time of the POS backend.
+
+Each measurement runs in a fresh interpreter so module caches do not hide the
+cost. Run from the repo root:
+
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SNIPPET = """
+import time
+t0 = time.perf_counter()
+import generate_qrcode_api
+t1 = time.perf_counter()
+app = generate_qrcode_api.create_app({"IRIS_ACCESS_TOKEN": "bench", "API_KEY": "bench"})
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+"""
+
+
+def measure(runs: int):
+    imports, boots = [], []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _SNIPPET],
+            cwd=_REPO_ROOT, check=True, capture_output=True, text=True,
+        ).stdout.split()
+        imports.append(float(out[0]))
+        boots.append(float(out[1]))
+    return imports, boots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports, boots = measure(args.runs)
+    print(f"import generate_qrcode_api: median {statistics.median(imports) * 1000:.1f} ms")
+    print(f"create_app():               median {statistics.median(boots) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,80 @@
 #驗證端 - QR Code 產生
-import requests
 import uuid
 import base64
 import json
 import os
+import threading
 from datetime import datetime
-from dotenv import load_dotenv
 from typing import Optional
 
-# Load environment variables
-load_dotenv()
-
 # --- 配置區 ---
-ACCESS_TOKEN = os.getenv('IRIS_ACCESS_TOKEN', '')
-if not ACCESS_TOKEN:
-    raise ValueError("IRIS_ACCESS_TOKEN not found in environment variables. Please set it in .env file.")
-    
-API_BASE_URL = "https://verifier-sandbox.wallet.gov.tw/api/oidvp/qrcode"
+VERIFIER_BASE_URL = "https://verifier-sandbox.wallet.gov.tw"
+QRCODE_PATH = "/api/oidvp/qrcode"
+RESULT_PATH = "/api/oidvp/result"
+API_BASE_URL = VERIFIER_BASE_URL + QRCODE_PATH
+RESULT_URL = VERIFIER_BASE_URL + RESULT_PATH
 # --- 配置區 ---
 
+# Shared HTTP session (connection pool). `requests` is imported lazily so that
+# importing this module stays cheap; the session is dropped after fork so each
+# worker process opens its own sockets instead of sharing the parent's.
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide requests.Session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+
+                _session = requests.Session()
+    return _session
+
+
+def reset_session():
+    """Forget the current session; the next call to get_session() opens a new pool."""
+    global _session
+    session, _session = _session, None
+    if session is not None:
+        try:
+            session.close()
+        except Exception:
+            pass
+
+
+def _reset_session_after_fork():
+    # The child must not reuse sockets inherited from the parent, and the lock
+    # may have been held by another thread at fork time.
+    global _session, _session_lock
+    _session = None
+    _session_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_session_after_fork)
+
+
+def get_access_token() -> str:
+    """從環境變數 (.env) 讀取 IRIS_ACCESS_TOKEN，供命令列流程使用。"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    access_token = os.getenv('IRIS_ACCESS_TOKEN', '')
+    if not access_token:
+        raise ValueError("IRIS_ACCESS_TOKEN not found in environment variables. Please set it in .env file.")
+    return access_token
+
 
 def generate_new_transaction_id():
     """自動產生 UUID v4 格式的唯一交易序號"""
     return str(uuid.uuid4())
 
-def get_qrcode_image(ref_value: str, access_token: str, transaction_id: str) -> Optional[dict]:
+def get_qrcode_image(ref_value: str, access_token: str, transaction_id: str, verbose: bool = True,
+                     session=None, url: str = API_BASE_URL, timeout: Optional[float] = None,
+                     extra_headers: Optional[dict] = None) -> Optional[dict]:
     """
     呼叫數位憑證皮夾驗證端 API 產生 QR Code
     
@@ -32,6 +82,11 @@ def get_qrcode_image(ref_value: str, access_token: str, transaction_id: str) ->
         ref_value: 驗證服務代碼 (ref)。
         access_token: 驗證端沙盒系統的 AccessToken。
         transaction_id: 本次請求的唯一交易序號 (UUID)。
+        verbose: 是否印出請求步驟（錯誤訊息一律印出）。
+        session: 使用的 requests.Session；預設為共用連線池。
+        url: QR Code API 位址；預設為沙盒環境。
+        timeout: 連線/讀取逾時秒數；None 表示不限制。
+        extra_headers: 額外的請求標頭（例如追蹤用的 traceparent）。
 
     Returns:
         包含 API 回應資料 (transactionId, qrcodeImage, authUri) 的字典。
@@ -46,20 +101,25 @@ def get_qrcode_image(ref_value: str, access_token: str, transaction_id: str) ->
     # 設置請求標頭
     headers = {
         "accept": "*/*",
-        "Access-Token": access_token
+        "Access-Token": access_token,
+        **(extra_headers or {}),
     }
     
-    print("--- 步驟 1: 發送 QR Code 產生請求 ---")
-    print(f"使用的 ref: {ref_value}")
-    print(f"使用的 transactionId: {transaction_id}")
+    if verbose:
+        print("--- 步驟 1: 發送 QR Code 產生請求 ---")
+        print(f"使用的 ref: {ref_value}")
+        print(f"使用的 transactionId: {transaction_id}")
     
+    import requests
+
     try:
-        response = requests.get(API_BASE_URL, headers=headers, params=params, verify=True)
+        response = (session or get_session()).get(url, headers=headers, params=params, verify=True, timeout=timeout)
         response.raise_for_status()  # 對 HTTP 錯誤狀態碼 (如 4xx, 5xx) 拋出異常
 
         # API 成功回應 (200 OK)
         response_data = response.json()
-        print("API 請求成功 (HTTP 200 OK)")
+        if verbose:
+            print("API 請求成功 (HTTP 200 OK)")
         return response_data
     
     except requests.exceptions.HTTPError as errh:
@@ -72,19 +132,15 @@ def get_qrcode_image(ref_value: str, access_token: str, transaction_id: str) ->
         print(f"請求失敗: {err}")
         return None
 
-def save_base64_to_png(base64_data: str, filename_prefix: str = "qrcode_output") -> Optional[str]:
+def decode_base64_image(base64_data: str) -> Optional[bytes]:
     """
-    將 Data URI 格式的 Base64 圖片資料儲存為 PNG 檔案。
-    
-    Args:
-        base64_data: 以 'data:image/png;base64,' 開頭的 Base64 字串。
-        filename_prefix: 圖片檔名的前綴。
+    解碼 Data URI 或純 Base64 格式的圖片資料。
 
     Returns:
-        儲存的檔案名稱。
+        圖片位元組；解碼失敗時回傳 None。
     """
-    # 移除 Data URI 的前綴部分
-    if base64_data.startswith("data:image/png;base64,"):
+    # 移除 Data URI 的前綴部分 (data:image/png;base64, / data:image/svg+xml;base64, ...)
+    if base64_data.startswith("data:") and ";base64," in base64_data:
         base64_content = base64_data.split(",")[1]
     else:
         # 假設如果沒有前綴，整個字串就是 base64 內容
@@ -92,17 +148,40 @@ def save_base64_to_png(base64_data: str, filename_prefix: str = "qrcode_output")
 
     # 解碼 Base64 內容
     try:
-        image_bytes = base64.b64decode(base64_content)
+        return base64.b64decode(base64_content)
     except Exception as e:
         print(f"Base64 解碼失敗: {e}")
         return None
-        
+
+def save_base64_to_png(base64_data: str, filename_prefix: str = "qrcode_output") -> Optional[str]:
+    """
+    將 Data URI 格式的 Base64 圖片資料儲存為 PNG 檔案。
+    
+    Args:
+        base64_data: 以 'data:image/png;base64,' 開頭的 Base64 字串。
+        filename_prefix: 圖片檔名的前綴。
+
+    Returns:
+        儲存的檔案名稱。
+    """
+    image_bytes = decode_base64_image(base64_data)
+    if image_bytes is None:
+        return None
+    return save_image_bytes(image_bytes, filename_prefix, "png")
+
+def save_image_bytes(image_bytes: bytes, filename_prefix: str = "qrcode_output", extension: str = "png") -> str:
+    """
+    將圖片位元組寫入 `<prefix>_<timestamp>.<extension>`。
+
+    Returns:
+        儲存的檔案名稱。
+    """
     # Sanitize the filename_prefix to prevent path traversal
     safe_prefix = os.path.basename(filename_prefix)
 
     # 組合檔案名稱並寫入
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{safe_prefix}_{timestamp}.png"
+    filename = f"{safe_prefix}_{timestamp}.{os.path.basename(extension)}"
     
     with open(filename, "wb") as f:
         f.write(image_bytes)
@@ -110,19 +189,22 @@ def save_base64_to_png(base64_data: str, filename_prefix: str = "qrcode_output")
     return filename
 
 
-def main_workflow(ref_to_test: str):
+def main_workflow(ref_to_test: str, access_token: Optional[str] = None):
     """
     主流程：生成交易ID -> 呼叫API獲取QR Code -> 儲存圖片。
     
     Args:
         ref_to_test: 您要測試的驗證服務代碼。
+        access_token: 驗證端 AccessToken；未提供時從環境變數讀取。
     """
-    
+    if access_token is None:
+        access_token = get_access_token()
+
     # 1. transactionId 自動產生
     new_transaction_id = generate_new_transaction_id()
 
     # 2. call API (return: QR Code) 
-    api_response = get_qrcode_image(ref_to_test, ACCESS_TOKEN, new_transaction_id)
+    api_response = get_qrcode_image(ref_to_test, access_token, new_transaction_id)
 
     if api_response is None:
         print("\n 測試中止：API 呼叫失敗或發生錯誤。")
@@ -153,19 +235,20 @@ def main_workflow(ref_to_test: str):
 
 
 #取得驗證內資料 
-def get_verification_result(transaction_id: str, access_token: str):
+def get_verification_result(transaction_id: str, access_token: str, session=None, url: str = RESULT_URL,
+                            timeout: Optional[float] = None, extra_headers: Optional[dict] = None):
     """
     查詢使用者掃描 QR Code 後的驗證結果。
     """
-    url = "https://verifier-sandbox.wallet.gov.tw/api/oidvp/result"
     headers = {
         "Content-Type": "application/json",
-        "Access-Token": access_token
+        "Access-Token": access_token,
+        **(extra_headers or {}),
     }
     payload = {"transactionId": transaction_id}
 
     print("\n--- 步驟 2: 查詢驗證結果 ---")
-    response = requests.post(url, headers=headers, json=payload)
+    response = (session or get_session()).post(url, headers=headers, json=payload, timeout=timeout)
 
     if response.status_code == 200:
         print("成功取得驗證結果")
@@ -1,47 +1,39 @@
-from flask import Flask, request, jsonify, Response, make_response,redirect
-import os
+from flask import Blueprint, Flask, current_app, request, jsonify, Response, make_response, redirect, stream_with_context
+import hashlib
+import time
 from functools import wraps
-from dotenv import load_dotenv
-from flask_cors import CORS
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 from markupsafe import escape
+import request_profiler
+import tracing
+from app_config import Config
+from shared_store import LocalExpiringStore, SharedExpiringStore
+from verifier_pool import VerifierPool
+from transaction_journal import AppendOnlyJournal
+from qr_render import (
+    DEFAULT_SIZE,
+    FORMATS as QR_FORMATS,
+    MAX_SIZE as QR_MAX_SIZE,
+    MIN_SIZE as QR_MIN_SIZE,
+    render_qr,
+)
 from generate_qrcode import (
-    get_qrcode_image,
     save_base64_to_png,
+    save_image_bytes,
     generate_new_transaction_id,
-    get_verification_result,
-    ACCESS_TOKEN,
 )
 import json
 from datetime import datetime, timedelta
 
-# Load environment variables
-load_dotenv()
-
-app = Flask(__name__)
+bp = Blueprint("pos", __name__)
 
-# Security: CORS configuration - only allow specific origins
-CORS(app, resources={
-    r"/api/*": {
-        "origins": ["http://localhost:*", "http://127.0.0.1:*"],  # 只允許本地開發
-        "methods": ["GET", "POST"],
-        "allow_headers": ["Content-Type", "X-API-Key"]
-    }
-})
-
-# Security: Rate limiting to prevent abuse
-limiter = Limiter(
-    get_remote_address,
-    app=app,
-    default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://",
-)
+# Per-route rate limits, applied by create_app() once the limiter exists
+ROUTE_LIMITS = {
+    "pos.api_generate_by_ref": "10 per minute",  # 每分鐘最多 10 次請求
+    "pos.api_result": "20 per minute",  # 查詢結果允許較高頻率
+}
 
-# Security: API Key from environment
-API_KEY = os.getenv('API_KEY', '')
-if not API_KEY:
-    raise ValueError("API_KEY not found in environment variables. Please set it in .env file.")
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPES = ["application/msgpack", "application/x-msgpack"]
 
 # Security: Whitelist of valid ref values
 VALID_REFS = {
@@ -55,23 +47,173 @@ VALID_REFS = {
 # Security: Time-limited sensitive data storage (expires after 10 minutes)
 last_result = {"transactionId": None, "authUri": None, "image": None, "ref": None, "expires_at": None}
 
+
+def create_app(config=None) -> Flask:
+    """
+    Application factory.
+
+    `config` may be a Config instance or a plain dict of overrides; when omitted
+    the settings are read from the environment (.env). Heavy extensions are
+    imported here rather than at module import so that importing this module
+    (tests, `gunicorn --preload`) stays cheap.
+    """
+    started = time.perf_counter()
+    if config is None:
+        config = Config.from_env()
+    elif isinstance(config, dict):
+        config = Config(**config)
+    config.validate()
+
+    app = Flask(__name__)
+    app.config.update(config.as_dict())
+
+    from flask_cors import CORS
+    from flask_limiter import Limiter
+    from flask_limiter.util import get_remote_address
+
+    # Security: CORS configuration - only allow specific origins
+    CORS(app, resources={
+        r"/api/*": {
+            "origins": app.config["CORS_ORIGINS"],
+            "methods": ["GET", "POST"],
+            "allow_headers": ["Content-Type", "X-API-Key", "Idempotency-Key"]
+        }
+    })
+
+    app.register_blueprint(bp)
+    request_profiler.install(app)
+    tracing.install(app)
+
+    app.extensions["shared_store"] = SharedExpiringStore(
+        app.config["SHARED_STORE_PATH"], max_entries=app.config["SHARED_STORE_MAX_ENTRIES"]
+    )
+    app.extensions["result_cache"] = LocalExpiringStore(max_entries=app.config["RESULT_CACHE_MAX_ENTRIES"])
+    # Pins live in the shared store so any worker can route a result lookup
+    # to the verifier that issued the transaction
+    app.extensions["verifier"] = VerifierPool.from_config(
+        app.config["VERIFIER_ENDPOINTS"],
+        app.config["IRIS_ACCESS_TOKEN"],
+        pin_store=app.extensions["shared_store"],
+        pool_size=app.config["VERIFIER_POOL_SIZE"],
+        eject_after=app.config["VERIFIER_EJECT_AFTER"],
+        eject_seconds=app.config["VERIFIER_EJECT_SECONDS"],
+        timeout=app.config["VERIFIER_TIMEOUT"],
+    )
+
+    if app.config["JOURNAL_PATH"]:
+        app.extensions["journal"] = AppendOnlyJournal(
+            app.config["JOURNAL_PATH"],
+            batch_size=app.config["JOURNAL_BATCH_SIZE"],
+            flush_interval=app.config["JOURNAL_FLUSH_INTERVAL"],
+        )
+
+    # Security: Rate limiting to prevent abuse
+    limiter = Limiter(
+        get_remote_address,
+        app=app,
+        default_limits=app.config["RATELIMIT_DEFAULT"],
+        storage_uri=app.config["RATELIMIT_STORAGE_URI"],
+        enabled=app.config["RATELIMIT_ENABLED"],
+    )
+    # Route limits only hold a weak proxy to the limiter, and init_app() does
+    # not register it when disabled; keep it alive for the app's lifetime.
+    app.extensions["rate_limiter"] = limiter
+    for endpoint, limit in ROUTE_LIMITS.items():
+        app.view_functions[endpoint] = tracing.traced_gate(
+            "rate_limit", limiter.limit(limit), app.view_functions[endpoint]
+        )
+
+    app.config["BOOT_SECONDS"] = time.perf_counter() - started
+    app.logger.info("app boot took %.1f ms", app.config["BOOT_SECONDS"] * 1000)
+    return app
+
+
+def __getattr__(name):
+    # Backwards compatible `generate_qrcode_api:app` target, built on first access.
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def require_api_key(f):
     """Decorator to require API Key authentication"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        api_key = request.headers.get('X-API-Key')
-        if not api_key or api_key != API_KEY:
-            app.logger.warning(f"Unauthorized access attempt from {request.remote_addr}")
+        with tracing.span("api_key_check"):
+            api_key = request.headers.get('X-API-Key')
+            authorized = bool(api_key) and api_key == current_app.config["API_KEY"]
+        if not authorized:
+            current_app.logger.warning(f"Unauthorized access attempt from {request.remote_addr}")
             return jsonify({"error": "Unauthorized. Valid API Key required."}), 401
         return f(*args, **kwargs)
     return decorated_function
 
+def _verifier() -> VerifierPool:
+    return current_app.extensions["verifier"]
+
+def _journal(event: str, **fields):
+    """Append an event to the transaction journal (no-op when disabled)."""
+    journal = current_app.extensions.get("journal")
+    if journal is None:
+        return
+    journal.record({"ts": time.time(), "event": event, **fields})
+
+def _load_result(tid: str, source: str):
+    """
+    Verification result for `tid` plus a digest of it ("pending" when there is none yet).
+
+    Verified results are final, so they are kept in the worker's result cache
+    and served without another verifier call; anything else is re-queried every time so a
+    pending -> verified transition shows up immediately.
+    """
+    cached = _cached_result(tid)
+    if cached is not None:
+        return cached["data"], cached["digest"]
+
+    started = time.perf_counter()
+    result = _verifier().get_verification_result(tid)
+    _journal_result(tid, source, result, time.perf_counter() - started)
+    if result is None:
+        return None, "pending"
+    digest = hashlib.sha256(
+        json.dumps(result, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    if result.get("verifyResult"):
+        current_app.extensions["result_cache"].set("result:" + tid, {"data": result, "digest": digest},
+                                                   current_app.config["RESULT_CACHE_TTL_SECONDS"])
+    return result, digest
+
+def _cached_result(tid: str):
+    """Cached {"data", "digest"} of a verified result, or None."""
+    return current_app.extensions["result_cache"].get("result:" + tid)
+
+def _journal_result(tid: str, source: str, result, latency: float):
+    """Journal the outcome of a verification result lookup."""
+    if result is None:
+        _journal("result", transactionId=tid, source=source, status="pending",
+                 latency_ms=round(latency * 1000, 2))
+        return
+    pricing = _compute_pricing(result)
+    _journal(
+        "result",
+        transactionId=tid,
+        source=source,
+        status="verified" if result.get("verifyResult") else "unverified",
+        identity=pricing["identity"],
+        credentialTypes=_credential_types(result),
+        total=pricing["total"],
+        discount=pricing["discount_amount"],
+        latency_ms=round(latency * 1000, 2),
+    )
+
 def clear_expired_data():
     """Clear sensitive data if expired"""
     if last_result.get("expires_at"):
         if datetime.now() > last_result["expires_at"]:
             last_result.update({"transactionId": None, "authUri": None, "image": None, "ref": None, "expires_at": None})
-@app.route("/health", methods=["GET"])
+@bp.route("/health", methods=["GET"])
 def health():
     """Simple liveness check to verify network reachability from devices."""
     return Response("ok", mimetype="text/plain")
@@ -79,13 +221,15 @@ def health():
 
 
 
-@app.route("/api/generate_by_ref", methods=["POST"])
-@limiter.limit("10 per minute")  # 每分鐘最多 10 次請求
+@bp.route("/api/generate_by_ref", methods=["POST"])
 @require_api_key
 def api_generate_by_ref():
     """
     POST JSON: {"ref": "<ref_value>"}
+        選填: {"render": "local", "size": 240, "format": "png" | "svg"}
+        render=local 時由 authUri 在本機產生指定尺寸的 QR Code，而非儲存上游的 qrcodeImage
     Headers: {"X-API-Key": "your-api-key"}
+        選填: {"Idempotency-Key": "<client key>"}，重送時回傳第一次的結果而不重新產生交易
     回傳 JSON: {"transactionId": "...", "authUri": "...", "image": "<filepath>"}
     """
     try:
@@ -98,36 +242,72 @@ def api_generate_by_ref():
         
         # Whitelist validation
         if ref not in VALID_REFS:
-            app.logger.warning(f"Invalid ref attempted: {ref} from {request.remote_addr}")
+            current_app.logger.warning(f"Invalid ref attempted: {ref} from {request.remote_addr}")
             return jsonify({"error": "invalid ref value"}), 400
+
+        render = data.get("render", "upstream")
+        image_format = str(data.get("format", "png")).lower()
+        image_size = data.get("size", DEFAULT_SIZE)
+        if render not in ("upstream", "local"):
+            return jsonify({"error": "invalid render option"}), 400
+        if render == "local" and (
+            image_format not in QR_FORMATS
+            or not isinstance(image_size, int)
+            or not QR_MIN_SIZE <= image_size <= QR_MAX_SIZE
+        ):
+            return jsonify({"error": "invalid size or format"}), 400
     except Exception as e:
-        app.logger.error(f"Request validation error: {str(e)}")
+        current_app.logger.error(f"Request validation error: {str(e)}")
         return jsonify({"error": "Invalid request format"}), 400
     
     ref = data.get("ref")
     if not ref:
         return jsonify({"error": "missing ref"}), 400
 
+    def generate():
+        return _generate_transaction(ref, render, image_size, image_format)
+
+    idempotency_key = request.headers.get("Idempotency-Key")
+    if idempotency_key is not None:
+        return _run_idempotent(idempotency_key, data, generate)
+    payload, status = generate()
+    return jsonify(payload), status
+
+
+def _generate_transaction(ref: str, render: str, image_size: int, image_format: str):
+    """Create a verifier transaction and save its QR Code; returns (payload, http_status)."""
     try:
         transaction_id = generate_new_transaction_id()
-        api_resp = get_qrcode_image(ref, ACCESS_TOKEN, transaction_id)
+        started = time.perf_counter()
+        api_resp = _verifier().get_qrcode_image(ref, transaction_id)
+        latency_ms = round((time.perf_counter() - started) * 1000, 2)
         if not api_resp:
-            app.logger.error("Failed to get QR code from external API")
-            return jsonify({"error": "Service temporarily unavailable"}), 502
+            _journal("generate", transactionId=transaction_id, ref=ref, ok=False, latency_ms=latency_ms)
+            current_app.logger.error("Failed to get QR code from external API")
+            return {"error": "Service temporarily unavailable"}, 502
 
         # 取回可能的 transactionId / qrcode / authUri
         tid = api_resp.get("transactionId", transaction_id)
         qrcode_b64 = api_resp.get("qrcodeImage")
         auth_uri = api_resp.get("authUri")
+        _journal("generate", transactionId=tid, ref=ref, ok=True, latency_ms=latency_ms)
 
         image_path = None
-        if qrcode_b64:
+        if render == "local" and auth_uri:
+            try:
+                with tracing.span("save_image", render="local", format=image_format):
+                    image_path = save_image_bytes(render_qr(auth_uri, image_size, image_format), ref, image_format)
+            except Exception as e:
+                # 儲存失敗但不阻擋回傳
+                current_app.logger.warning(f"local render failed: {e}")
+        elif qrcode_b64:
             try:
-                image_path = save_base64_to_png(qrcode_b64, ref)
+                with tracing.span("save_image", render="upstream", format="png"):
+                    image_path = save_base64_to_png(qrcode_b64, ref)
             except Exception as e:
                 # 儲存失敗但不阻擋回傳
                 image_path = None
-                app.logger.warning(f"save image failed: {e}")
+                current_app.logger.warning(f"save image failed: {e}")
 
         # Security: Set expiration time for sensitive data (10 minutes)
         expires_at = datetime.now() + timedelta(minutes=10)
@@ -138,20 +318,75 @@ def api_generate_by_ref():
             "ref": ref,
             "expires_at": expires_at
         })
-        return jsonify({"transactionId": tid, "authUri": auth_uri, "image": image_path})
+        if auth_uri:
+            current_app.extensions["shared_store"].set(
+                "qr:" + tid, auth_uri, current_app.config["QRCODE_TTL_SECONDS"]
+            )
+        return {"transactionId": tid, "authUri": auth_uri, "image": image_path}, 200
     except Exception as e:
-        app.logger.error(f"Error in generate_by_ref: {str(e)}")
-        return jsonify({"error": "Internal server error"}), 500
+        current_app.logger.error(f"Error in generate_by_ref: {str(e)}")
+        return {"error": "Internal server error"}, 500
+
 
+def _run_idempotent(idempotency_key: str, request_body: dict, produce):
+    """
+    Run `produce` at most once per Idempotency-Key.
 
-@app.route("/api/result", methods=["POST"])
-@limiter.limit("20 per minute")  # 查詢結果允許較高頻率
+    Successful responses are stored in the shared store for the QR validity
+    window and replayed for repeats of the same key. A repeat that arrives
+    while the first request is still running waits for its result instead of
+    calling the verifier again. Failed attempts are not stored, so a client
+    retry after an error gets a fresh attempt.
+    """
+    if not idempotency_key or len(idempotency_key) > 255:
+        return jsonify({"error": "invalid Idempotency-Key"}), 400
+
+    store = current_app.extensions["shared_store"]
+    store_key = "idem:" + hashlib.sha256(idempotency_key.encode("utf-8")).hexdigest()
+    fingerprint = hashlib.sha256(
+        json.dumps(request_body, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    lock_seconds = current_app.config["IDEMPOTENCY_LOCK_SECONDS"]
+
+    # Second pass: the first owner failed (or its claim expired) while we waited
+    for _ in range(2):
+        if store.claim(store_key, lock_seconds):
+            try:
+                # produce() may fail over across every verifier endpoint, so the
+                # claim is renewed rather than trusted to outlast it
+                with store.keep_claimed(store_key, lock_seconds):
+                    payload, status = produce()
+            except Exception:
+                store.release(store_key)
+                raise
+            if 200 <= status < 300:
+                store.set(store_key, {"fingerprint": fingerprint, "status": status, "body": payload},
+                          current_app.config["IDEMPOTENCY_TTL_SECONDS"])
+            else:
+                store.release(store_key)
+            return jsonify(payload), status
+
+        stored = store.wait(store_key, lock_seconds)
+        if stored is not None:
+            if stored["fingerprint"] != fingerprint:
+                return jsonify({"error": "Idempotency-Key was already used with a different request"}), 422
+            resp = jsonify(stored["body"])
+            resp.status_code = stored["status"]
+            resp.headers["Idempotent-Replayed"] = "true"
+            return resp
+
+    return jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409
+
+
+@bp.route("/api/result", methods=["POST"])
 @require_api_key
 def api_result():
     """
-    POST JSON: {"transactionId": "..."}
+    POST JSON: {"transactionId": "...", "fields": ["verifyResult", "discount"]}
     Headers: {"X-API-Key": "your-api-key"}
-    直接呼叫 get_verification_result 並回傳原始結果
+        選填: {"Accept": "application/msgpack"} 以 MessagePack 回傳
+    直接呼叫 get_verification_result 並回傳原始結果；
+    指定 fields（或 ?fields=a,b）時只回傳所需欄位，可用欄位見 RESULT_FIELDS
     """
     try:
         data = request.get_json() or {}
@@ -159,29 +394,99 @@ def api_result():
         if not tid:
             return jsonify({"error": "missing transactionId"}), 400
 
-        result = get_verification_result(tid, ACCESS_TOKEN)
+        fields = data.get("fields", request.args.get("fields"))
+        if isinstance(fields, str):
+            fields = [f.strip() for f in fields.split(",") if f.strip()]
+        if fields is not None and (
+            not isinstance(fields, list) or not fields
+            or not all(isinstance(f, str) and f in RESULT_FIELDS for f in fields)
+        ):
+            return jsonify({"error": "invalid fields", "available": sorted(RESULT_FIELDS)}), 400
+
+        mimetype = _negotiate_result_mimetype()
+        if mimetype is None:
+            return jsonify({"error": "Not acceptable", "available": _result_mimetypes()}), 406
+
+        result, _ = _load_result(tid, "api")
         if result is None:
             return jsonify({"error": "Verification result not available yet"}), 404
-        return jsonify(result)
+        if fields is not None:
+            result = {field: RESULT_FIELDS[field](result) for field in fields}
+        return _encode_result(result, mimetype)
     except Exception as e:
-        app.logger.error(f"Error in api_result: {str(e)}")
+        current_app.logger.error(f"Error in api_result: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
 
 
 
-def _html_page(title: str, body_html: str) -> Response:
-    safe_title = escape(title)
-    html = f"""
+def _result_mimetypes() -> list:
+    """Encodings /api/result can produce; MessagePack only when msgpack is installed."""
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        return [JSON_MIMETYPE]
+    return [JSON_MIMETYPE] + MSGPACK_MIMETYPES
+
+
+def _negotiate_result_mimetype():
+    """Best encoding for the request's Accept header (JSON by default), or None."""
+    if not request.accept_mimetypes:
+        return JSON_MIMETYPE
+    return request.accept_mimetypes.best_match(_result_mimetypes())
+
+
+def _encode_result(result: dict, mimetype: str) -> Response:
+    if mimetype == JSON_MIMETYPE:
+        resp = jsonify(result)
+    else:
+        import msgpack
+
+        resp = Response(msgpack.packb(result, use_bin_type=True), mimetype=mimetype)
+    resp.vary.add("Accept")
+    return resp
+
+
+@bp.route("/view/qrcode", methods=["GET"])
+def view_qrcode():
+    """
+    GET /view/qrcode?transactionId=...&size=240&format=svg
+    以該交易的 authUri 在本機產生 QR Code 圖片，尺寸/格式依顯示裝置需求
+    authUri 存於各 worker 共用的 shared store，任何 worker 都能回應
+    """
+    tid = request.args.get("transactionId")
+    if not tid:
+        return jsonify({"error": "missing transactionId"}), 400
+    auth_uri = current_app.extensions["shared_store"].get("qr:" + tid)
+    if not auth_uri:
+        return jsonify({"error": "no active transaction"}), 404
+
+    image_format = request.args.get("format", "png").lower()
+    try:
+        image = render_qr(auth_uri, request.args.get("size", DEFAULT_SIZE), image_format)
+    except ValueError:
+        return jsonify({"error": "invalid size or format"}), 400
+    except ImportError as e:
+        current_app.logger.error(str(e))
+        return jsonify({"error": "Local rendering not available"}), 501
+
+    resp = Response(image, mimetype=QR_FORMATS[image_format])
+    # The authUri is fixed for the life of a transaction
+    resp.headers["Cache-Control"] = "private, max-age=300"
+    return resp
+
+
+
+
+_PAGE_HEAD = """
 <!doctype html>
 <html lang=zh-Hant>
 <head>
   <meta charset="utf-8" />
   <meta name="viewport" content="width=device-width, initial-scale=1" />
-  <title>{safe_title}</title>
   <style>
-    * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-    body {{ 
+    * { margin: 0; padding: 0; box-sizing: border-box; }
+    body { 
       font-family: -apple-system, BlinkMacSystemFont, 'SF Pro Display', 'Helvetica Neue', Helvetica, Arial, sans-serif; 
       background: #f2f2f7; 
       min-height: 100vh;
@@ -189,81 +494,81 @@ def _html_page(title: str, body_html: str) -> Response:
       align-items: center;
       justify-content: center;
       padding: 20px;
-    }}
-    .pos-container {{ 
+    }
+    .pos-container { 
       background: #ffffff; 
       border-radius: 20px; 
       box-shadow: 0 10px 30px rgba(0, 0, 0, 0.1), 0 1px 8px rgba(0, 0, 0, 0.05);
       max-width: 400px; 
       width: 100%; 
       overflow: hidden;
-    }}
-    .pos-header {{ 
+    }
+    .pos-header { 
       background: linear-gradient(135deg, #007AFF 0%, #5856D6 100%);
       color: white; 
       padding: 24px; 
       text-align: center; 
-    }}
-    .pos-header h1 {{ 
+    }
+    .pos-header h1 { 
       font-size: 22px; 
       font-weight: 600; 
       margin-bottom: 4px;
       letter-spacing: -0.5px;
-    }}
-    .pos-header .subtitle {{ 
+    }
+    .pos-header .subtitle { 
       font-size: 14px; 
       opacity: 0.85; 
       font-weight: 400;
-    }}
-    .pos-content {{ 
+    }
+    .pos-content { 
       padding: 24px; 
-    }}
-    .receipt-section {{ 
+    }
+    .receipt-section { 
       border-bottom: 1px dashed #d1d1d6; 
       padding-bottom: 20px; 
       margin-bottom: 20px; 
-    }}
-    .receipt-section:last-child {{ 
+    }
+    .receipt-section:last-child { 
       border-bottom: none; 
       margin-bottom: 0; 
-    }}
-    .receipt-row {{ 
+    }
+    .receipt-row { 
       display: flex; 
       justify-content: space-between; 
       align-items: center; 
       margin-bottom: 12px; 
-    }}
-    .receipt-row:last-child {{ 
+    }
+    .receipt-row:last-child { 
       margin-bottom: 0; 
-    }}
-    .receipt-label {{ 
+    }
+    .receipt-label { 
       font-size: 15px; 
       color: #48484a; 
       font-weight: 400;
-    }}
-    .receipt-value {{ 
+    }
+    .receipt-value { 
       font-size: 15px; 
       color: #1c1c1e; 
       font-weight: 500;
       text-align: right;
       max-width: 60%;
       word-break: break-all;
-    }}
-    .total-row {{ 
+    }
+    .total-row { 
       font-size: 18px; 
       font-weight: 600; 
       padding-top: 12px; 
       border-top: 2px solid #007AFF;
-    }}
-    .total-row .receipt-label {{ 
+    }
+    .total-row .receipt-label { 
       color: #1c1c1e; 
       font-weight: 600;
-    }}
-    .total-row .receipt-value {{ 
+    }
+    .total-row .receipt-value { 
       color: #007AFF; 
       font-size: 20px;
-    }}
-    .status-badge {{ 
+    }
+    .status-badge { 
       display: inline-block; 
       padding: 6px 12px; 
       border-radius: 12px; 
@@ -271,26 +576,26 @@ def _html_page(title: str, body_html: str) -> Response:
       font-weight: 600; 
       text-transform: uppercase; 
       letter-spacing: 0.5px;
-    }}
-    .status-verified {{ 
+    }
+    .status-verified { 
       background: #e6f7ed; 
       color: #059669; 
-    }}
-    .status-pending {{ 
+    }
+    .status-pending { 
       background: #fef3e6; 
       color: #d97706; 
-    }}
-    .status-error {{ 
+    }
+    .status-error { 
       background: #fee6e6; 
       color: #dc2626; 
-    }}
-    .discount-note {{ 
+    }
+    .discount-note { 
       font-size: 13px; 
       color: #ff3b30; 
       font-weight: 500; 
       margin-left: 8px;
-    }}
-    .transaction-id {{ 
+    }
+    .transaction-id { 
       font-family: 'SF Mono', Monaco, 'Cascadia Code', 'Roboto Mono', monospace; 
       font-size: 12px; 
       color: #8e8e93; 
@@ -299,28 +604,28 @@ def _html_page(title: str, body_html: str) -> Response:
       background: #f9f9f9; 
       margin: -24px -24px 0 -24px; 
       border-top: 1px solid #e5e5ea;
-    }}
-    .empty-state {{ 
+    }
+    .empty-state { 
       text-align: center; 
       padding: 40px 24px; 
-    }}
-    .empty-state h2 {{ 
+    }
+    .empty-state h2 { 
       font-size: 18px; 
       color: #1c1c1e; 
       margin-bottom: 8px; 
       font-weight: 600;
-    }}
-    .empty-state p {{ 
+    }
+    .empty-state p { 
       font-size: 15px; 
       color: #8e8e93; 
       line-height: 1.4;
-    }}
-    .debug-section {{ 
+    }
+    .debug-section { 
       margin-top: 20px; 
       padding-top: 20px; 
       border-top: 1px solid #e5e5ea; 
-    }}
-    .debug-toggle {{ 
+    }
+    .debug-toggle { 
       background: #f2f2f7; 
       border: none; 
       padding: 10px 16px; 
@@ -330,15 +635,15 @@ def _html_page(title: str, body_html: str) -> Response:
       cursor: pointer; 
       width: 100%;
       font-weight: 500;
-    }}
-    .debug-content {{ 
+    }
+    .debug-content { 
       display: none; 
       margin-top: 12px; 
       background: #f9f9f9; 
       border-radius: 10px; 
       padding: 16px; 
-    }}
-    .debug-content pre {{ 
+    }
+    .debug-content pre { 
       font-family: 'SF Mono', Monaco, 'Cascadia Code', 'Roboto Mono', monospace; 
       font-size: 11px; 
       color: #48484a; 
@@ -346,30 +651,43 @@ def _html_page(title: str, body_html: str) -> Response:
       overflow-x: auto;
       white-space: pre-wrap;
       word-break: break-word;
-    }}
+    }
   </style>
   <script>
-    function toggleDebug() {{
+    function toggleDebug() {
       const content = document.getElementById('debug-content');
       const button = document.getElementById('debug-toggle');
-      if (content.style.display === 'none' || content.style.display === '') {{
+      if (content.style.display === 'none' || content.style.display === '') {
         content.style.display = 'block';
         button.textContent = '隱藏詳細資訊';
-      }} else {{
+      } else {
         content.style.display = 'none';
         button.textContent = '顯示詳細資訊';
-      }}
-    }}
+      }
+    }
   </script>
+"""
+
+
+def _page_tail(title: str, body_html: str) -> str:
+    # <title> is the first thing that depends on the result, so everything
+    # before it (_PAGE_HEAD) can be sent while the result is still loading.
+    return f"""  <title>{escape(title)}</title>
 </head>
 <body>
 {body_html}
 </body>
 </html>
 """
-    resp = make_response(html)
+
+
+@tracing.traced("render_html")
+def _html_page(title: str, body_html: str, etag: str = None) -> Response:
+    resp = make_response(_PAGE_HEAD + _page_tail(title, body_html))
     resp.mimetype = "text/html"
     resp.charset = "utf-8"
+    if etag:
+        return _set_revalidate_headers(resp, etag)
     # Prevent caching so reloading always fetches the latest
     resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
     resp.headers["Pragma"] = "no-cache"
@@ -377,17 +695,25 @@ def _html_page(title: str, body_html: str) -> Response:
     return resp
 
 
+def _set_revalidate_headers(resp: Response, etag: str) -> Response:
+    """Let the browser keep the page but revalidate it (If-None-Match) on every load."""
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache, must-revalidate, max-age=0"
+    return resp
+
+
 
 
 # http://192.168.0.236:5001/view/result 
-@app.route("/view/result", methods=["GET"])
+@bp.route("/view/result", methods=["GET"])
 def view_result():
     tid = request.args.get("transactionId") 
     # 若網址沒有 transactionId，就用最近一次的結果
     if not tid and last_result.get("transactionId"):
         tid = last_result["transactionId"]
         # 這時候 redirect 到有 transactionId 的 URL
-        return redirect(f"/view/result?transactionId={tid}", code=302)
+        stream = "&stream=1" if request.args.get("stream") == "1" else ""
+        return redirect(f"/view/result?transactionId={tid}{stream}", code=302)
 
     # 如果仍然沒有 transactionId，就顯示「尚未產生交易」
     if not tid:
@@ -404,10 +730,47 @@ def view_result():
             "</div>"
         )
         return _html_page("POS 收銀系統", body)
-    
+
+    # ?stream=1 sends the page head right away and the rest once the verifier
+    # answers; verified results are cached, so those skip straight to the ETag path.
+    if request.args.get("stream") == "1" and _cached_result(tid) is None:
+        return _stream_result_page(tid)
+
+    data, digest = _load_result(tid, "view")
+    # The page is a pure function of (transactionId, result), so a matching
+    # ETag means the POS already shows the right thing; skip rendering.
+    etag = hashlib.sha256(f"{tid}:{digest}".encode("utf-8")).hexdigest()[:32]
+    if request.if_none_match.contains(etag):
+        return _set_revalidate_headers(Response(status=304), etag)
+    return _html_page(*_result_page(tid, data), etag=etag)
+
+
+def _stream_result_page(tid: str) -> Response:
+    """/view/result as a stream: _PAGE_HEAD first, then the same tail _html_page would send."""
+    def generate():
+        yield _PAGE_HEAD
+        try:
+            data, _ = _load_result(tid, "view")
+        except Exception as e:
+            # The head is already out, so an error can only become the waiting page
+            current_app.logger.error(f"Error in view_result stream: {str(e)}")
+            data = None
+        with tracing.span("render_html", streamed=True):
+            yield _page_tail(*_result_page(tid, data))
+
+    resp = Response(stream_with_context(generate()), mimetype="text/html")
+    resp.charset = "utf-8"
+    resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
+    resp.headers["Pragma"] = "no-cache"
+    resp.headers["Expires"] = "0"
+    # Ask buffering proxies (nginx) to pass the head through immediately
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+
+def _result_page(tid: str, data):
+    """(title, body) of the result page for `tid`; `data` None means still pending."""
     safe_tid = escape(tid)
-      
-    data = get_verification_result(tid, ACCESS_TOKEN)
     if data is None:
         body = (
             "<div class='pos-container'>"
@@ -422,31 +785,19 @@ def view_result():
             f"<div class='transaction-id'>交易序號: {safe_tid}</div>"
             "</div>"
         )
-        return _html_page("POS 收銀系統 - 處理中", body)
+        return "POS 收銀系統 - 處理中", body
 
-    # 交易資訊：預設金額 100，身份為已驗證學生時 9 折
-    amount_val = 100.0
     # 動態抓取顯示標籤（來自第一個 claims 的 cname）與值
-    carrier_label, invoice_code = _extract_carrier_label_and_value(data)
-    has_student = _has_verified_student(data)
-    has_older = _has_verified_older(data)
-    
-    # Determine discount and identity
-    discount_amount = 0
-    if has_student:
-        total = amount_val * 0.9
-        identity_label = "學生"
-        discount_amount = amount_val * 0.1
-        discount_note = "-10%"
-    elif has_older:
-        total = amount_val * 0.8
-        identity_label = "長者"
-        discount_amount = amount_val * 0.2
-        discount_note = "-20%"
-    else:
-        total = amount_val
-        identity_label = "一般"
-        discount_note = ""
+    with tracing.span("extract_claims"):
+        carrier_label, invoice_code = _extract_carrier_label_and_value(data)
+
+        # Determine discount and identity
+        pricing = _compute_pricing(data)
+    amount_val = pricing["amount"]
+    total = pricing["total"]
+    identity_label = pricing["identity"]
+    discount_amount = pricing["discount_amount"]
+    discount_note = pricing["discount_note"]
     
     verification_status = "已驗證" if data.get("verifyResult") else "待驗證"
     status_class = "status-verified" if data.get("verifyResult") else "status-pending"
@@ -521,7 +872,7 @@ def view_result():
 </div>
 """
 
-    return _html_page("POS 收銀系統", body)
+    return "POS 收銀系統", body
 
 
 
@@ -632,7 +983,50 @@ def _has_verified_older(data: dict) -> bool:
     return False
 
 
+def _credential_types(data: dict) -> list:
+    """credentialType of every item in the result's data array, in order."""
+    return [
+        item.get("credentialType")
+        for item in data.get("data", [])
+        if isinstance(item, dict) and item.get("credentialType")
+    ]
+
+def _compute_pricing(data: dict) -> dict:
+    """交易資訊：預設金額 100，已驗證學生 9 折、長者 8 折。"""
+    amount_val = 100.0
+    if _has_verified_student(data):
+        return {"amount": amount_val, "identity": "學生", "discount_amount": amount_val * 0.1,
+                "discount_note": "-10%", "total": amount_val * 0.9}
+    if _has_verified_older(data):
+        return {"amount": amount_val, "identity": "長者", "discount_amount": amount_val * 0.2,
+                "discount_note": "-20%", "total": amount_val * 0.8}
+    return {"amount": amount_val, "identity": "一般", "discount_amount": 0,
+            "discount_note": "", "total": amount_val}
+
+def _result_discount(data: dict) -> dict:
+    pricing = _compute_pricing(data)
+    return {
+        "amount": pricing["amount"],
+        "discount": pricing["discount_amount"],
+        "note": pricing["discount_note"],
+        "total": pricing["total"],
+    }
+
+def _result_carrier(data: dict):
+    label, value = _extract_carrier_label_and_value(data)
+    return {"label": label, "value": value} if value else None
+
+# Projections available through /api/result `fields`; each is computed from the
+# raw verifier payload only when requested
+RESULT_FIELDS = {
+    "verifyResult": lambda data: bool(data.get("verifyResult")),
+    "credentialTypes": _credential_types,
+    "carrier": _result_carrier,
+    "identity": lambda data: _compute_pricing(data)["identity"],
+    "discount": _result_discount,
+}
+
 
 if __name__ == "__main__":
     # 執行：在 uuse 資料夾啟動 python generate_qrcode_api.py
-    app.run(host="127.0.0.1", port=5001, debug=False)
\ No newline at end of file
+    create_app().run(host="127.0.0.1", port=5001, debug=False)
\ No newline at end of file
@@ -0,0 +1,231 @@
+"""
+批次產生 QR Code（印刷看板、測試資料）。
+
+Runs get_qrcode_image for many refs concurrently through a bounded thread
+pool sharing one pooled HTTP session, and streams each result as soon as it
+completes. Finished items are recorded in a JSON-lines manifest; re-running
+the same command skips them, so an interrupted run resumes where it stopped.
+
+    python generate_qrcode_bulk.py 00000000_iris_enter_mrt:50 00000000_irisstudent:10 --out-dir qrcodes
+    python generate_qrcode_bulk.py --refs-file refs.txt --jsonl qrcodes.jsonl --workers 16
+    python generate_qrcode_bulk.py 00000000_iris_enter_mrt:20 --render local --size 600 --format svg
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from generate_qrcode import (
+    decode_base64_image,
+    generate_new_transaction_id,
+    get_access_token,
+    get_qrcode_image,
+    get_session,
+)
+from qr_render import DEFAULT_SIZE, FORMATS as QR_FORMATS, render_qr
+
+
+def parse_ref_spec(spec: str, default_count: int = 1):
+    """'ref' or 'ref:count' (a comma is accepted instead of the colon)."""
+    ref, sep, count = spec.strip().replace(",", ":").partition(":")
+    if not ref:
+        raise ValueError(f"empty ref in {spec!r}")
+    if not sep:
+        return ref, default_count
+    if not count.strip().isdigit():
+        raise ValueError(f"invalid count in {spec!r}")
+    return ref, int(count)
+
+
+def expand_items(specs, default_count: int = 1):
+    """
+    Yield (item_id, ref) for every requested QR code, in a stable order.
+
+    Repeating a ref does not add codes: `a:2 a:3` means three codes for `a`,
+    since the repeated IDs would overwrite the same output.
+    """
+    seen = set()
+    for spec in specs:
+        ref, count = parse_ref_spec(spec, default_count)
+        safe_ref = os.path.basename(ref)
+        for index in range(count):
+            item_id = f"{safe_ref}-{index:04d}"
+            if item_id not in seen:
+                seen.add(item_id)
+                yield item_id, ref
+
+
+def load_completed(manifest_path: str) -> set:
+    """IDs of items already written successfully by a previous run."""
+    done = set()
+    if not os.path.exists(manifest_path):
+        return done
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # truncated last line after an interruption
+            if entry.get("status") == "ok":
+                done.add(entry.get("id"))
+    return done
+
+
+def _generate_one(item_id: str, ref: str, access_token: str, local_render=None) -> dict:
+    """local_render: None to keep the upstream image, or (size, format) to render from authUri."""
+    transaction_id = generate_new_transaction_id()
+    api_resp = get_qrcode_image(ref, access_token, transaction_id, verbose=False)
+    if not api_resp:
+        return {"id": item_id, "ref": ref, "status": "failed"}
+
+    image_format = "png"
+    qrcode_image = api_resp.get("qrcodeImage")
+    if local_render is not None and api_resp.get("authUri"):
+        size, image_format = local_render
+        encoded = base64.b64encode(render_qr(api_resp["authUri"], size, image_format)).decode("ascii")
+        qrcode_image = f"data:{QR_FORMATS[image_format]};base64,{encoded}"
+    if not qrcode_image:
+        return {"id": item_id, "ref": ref, "status": "failed"}
+    return {
+        "id": item_id,
+        "ref": ref,
+        "status": "ok",
+        "transactionId": api_resp.get("transactionId", transaction_id),
+        "authUri": api_resp.get("authUri"),
+        "format": image_format,
+        "qrcodeImage": qrcode_image,
+    }
+
+
+class _DirectorySink:
+    """One image file per item in out_dir, plus out_dir/manifest.jsonl."""
+
+    def __init__(self, out_dir: str):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.manifest_path = os.path.join(out_dir, "manifest.jsonl")
+
+    def store(self, result: dict) -> dict:
+        image_b64 = result.pop("qrcodeImage", None)
+        if result["status"] == "ok":
+            image_bytes = decode_base64_image(image_b64)
+            if image_bytes is None:
+                return {"id": result["id"], "ref": result["ref"], "status": "failed"}
+            filename = f"{result['id']}.{result.get('format', 'png')}"
+            path = os.path.join(self.out_dir, filename)
+            # Write-then-rename so a resumed run never sees a half-written image
+            with open(path + ".tmp", "wb") as f:
+                f.write(image_bytes)
+            os.replace(path + ".tmp", path)
+            result["file"] = filename
+        return result
+
+
+class _JsonlSink:
+    """Single JSON-lines file; each line carries the image inline."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.manifest_path = path
+
+    def store(self, result: dict) -> dict:
+        return result
+
+
+def run(items, sink, access_token: str, workers: int = 8, progress=sys.stderr, local_render=None) -> dict:
+    """
+    Generate every (item_id, ref) not yet in the sink's manifest.
+
+    At most ``2 * workers`` requests are queued at a time so memory stays flat
+    for large batches. Returns counts of ok / failed / skipped items.
+    """
+    completed = load_completed(sink.manifest_path)
+    pending = []
+    stats = {"ok": 0, "failed": 0, "skipped": 0}
+    for item_id, ref in items:
+        if item_id in completed:
+            stats["skipped"] += 1
+        else:
+            pending.append((item_id, ref))
+    total = len(pending)
+
+    # One adapter sized to the pool so threads do not queue for connections
+    from requests.adapters import HTTPAdapter
+
+    get_session().mount("https://", HTTPAdapter(pool_connections=workers, pool_maxsize=workers))
+
+    with open(sink.manifest_path, "a", encoding="utf-8") as manifest, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        queue_iter = iter(pending)
+        in_flight = {}  # future -> (item_id, ref)
+        while True:
+            while len(in_flight) < workers * 2:
+                nxt = next(queue_iter, None)
+                if nxt is None:
+                    break
+                in_flight[pool.submit(_generate_one, nxt[0], nxt[1], access_token, local_render)] = nxt
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                item_id, ref = in_flight.pop(future)
+                try:
+                    entry = sink.store(future.result())
+                except Exception as e:
+                    # One bad item (unexpected reply, render error) must not stop
+                    # the batch; it is recorded as failed and retried on resume
+                    entry = {"id": item_id, "ref": ref, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+                manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                manifest.flush()
+                stats[entry["status"]] += 1
+            if progress is not None:
+                done = stats["ok"] + stats["failed"]
+                progress.write(f"\r[{done}/{total}] ok={stats['ok']} failed={stats['failed']}")
+                progress.flush()
+    if progress is not None and total:
+        progress.write("\n")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate many QR codes concurrently.")
+    parser.add_argument("refs", nargs="*", help="ref or ref:count")
+    parser.add_argument("--refs-file", help="file with one ref or ref:count per line")
+    parser.add_argument("--count", type=int, default=1, help="QR codes per ref when no count is given")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent requests (default 8)")
+    parser.add_argument("--render", choices=("upstream", "local"), default="upstream",
+                        help="use the verifier's qrcodeImage (default) or render locally from authUri")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE, help="pixel size for --render local")
+    parser.add_argument("--format", choices=sorted(QR_FORMATS), default="png", help="image format for --render local")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--out-dir", default="qrcodes", help="write PNGs + manifest.jsonl here (default)")
+    target.add_argument("--jsonl", help="write everything to one JSON-lines file instead")
+    args = parser.parse_args(argv)
+
+    specs = list(args.refs)
+    if args.refs_file:
+        with open(args.refs_file, "r", encoding="utf-8") as f:
+            specs.extend(line for line in f if line.strip() and not line.startswith("#"))
+    if not specs:
+        parser.error("no refs given")
+    try:
+        items = list(expand_items(specs, args.count))
+    except ValueError as e:
+        parser.error(str(e))
+
+    sink = _JsonlSink(args.jsonl) if args.jsonl else _DirectorySink(args.out_dir)
+    local_render = (args.size, args.format) if args.render == "local" else None
+    if local_render is not None:
+        render_qr("size-check", args.size, args.format)  # fail fast on bad size / missing segno
+    stats = run(items, sink, get_access_token(),
+                workers=max(1, args.workers), local_render=local_render)
+    print(f"完成: {stats['ok']} 成功, {stats['failed']} 失敗, {stats['skipped']} 已存在略過")
+    return 0 if stats["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,17 @@
+# Gunicorn configuration: `gunicorn -c gunicorn.conf.py`
+#
+# The app is built once in the master (preload_app) and shared copy-on-write
+# by the workers. No post_fork hook is needed: state holding sockets or
+# threads resets itself in each worker via os.register_at_fork (verifier
+# endpoint sessions, journal and trace writers) or a pid check (shared store
+# connections).
+
+wsgi_app = "generate_qrcode_api:create_app()"
+bind = "127.0.0.1:5001"
+workers = 4
+timeout = 120
+preload_app = True
+
+accesslog = "logs/access.log"
+errorlog = "logs/error.log"
+loglevel = "info"
@@ -0,0 +1,128 @@
+"""
+Offline analytics over the transaction journal (transaction_journal.py).
+
+Streams the journal line by line, so memory stays bounded by the number of
+distinct days / credential types / transactions rather than the file size:
+
+    python journal_report.py logs/transactions.jsonl
+    python journal_report.py logs/transactions.jsonl --json
+"""
+import argparse
+import json
+import math
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+from transaction_journal import read_entries
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram (~1% relative error per bucket).
+
+    Keeps a fixed number of counters regardless of how many samples are added,
+    so percentiles over arbitrarily large journals need constant memory.
+    """
+
+    _GROWTH = math.log(1.01)
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.total = 0
+
+    def add(self, value_ms: float):
+        bucket = int(math.log(value_ms) / self._GROWTH) if value_ms > 1 else 0
+        self.counts[bucket] += 1
+        self.total += 1
+
+    def percentile(self, pct: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = math.ceil(self.total * pct / 100)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return math.exp((bucket + 1) * self._GROWTH) if bucket else 1.0
+        return 0.0
+
+
+def summarize(entries) -> dict:
+    """Aggregate an iterable of journal entries into the report structure."""
+    days = defaultdict(lambda: {"generated": 0, "generate_failed": 0, "settled": 0, "revenue": 0.0, "discount": 0.0})
+    by_type = defaultdict(lambda: {"transactions": 0, "discounted": 0, "discount": 0.0})
+    latency = defaultdict(LatencyHistogram)
+    # A POS display polls /view/result repeatedly; only the first settled
+    # result per transaction counts towards totals.
+    settled = set()
+
+    for entry in entries:
+        event = entry.get("event")
+        day = datetime.fromtimestamp(entry.get("ts", 0)).strftime("%Y-%m-%d")
+        if entry.get("latency_ms") is not None:
+            latency[event].add(float(entry["latency_ms"]))
+
+        if event == "generate":
+            days[day]["generated" if entry.get("ok") else "generate_failed"] += 1
+        elif event == "result" and entry.get("status") in ("verified", "unverified"):
+            tid = entry.get("transactionId")
+            if tid in settled:
+                continue
+            settled.add(tid)
+            discount = float(entry.get("discount") or 0)
+            days[day]["settled"] += 1
+            days[day]["revenue"] += float(entry.get("total") or 0)
+            days[day]["discount"] += discount
+            for ctype in entry.get("credentialTypes") or ["(none)"]:
+                row = by_type[ctype]
+                row["transactions"] += 1
+                if discount:
+                    row["discounted"] += 1
+                    row["discount"] += discount
+
+    return {
+        "days": dict(sorted(days.items())),
+        "credential_types": dict(sorted(by_type.items())),
+        "latency_ms": {
+            event: {"count": hist.total, **{f"p{p}": round(hist.percentile(p), 1) for p in PERCENTILES}}
+            for event, hist in sorted(latency.items())
+        },
+    }
+
+
+def _print_report(report: dict, out=sys.stdout):
+    print("== Daily totals ==", file=out)
+    print(f"{'day':<12}{'generated':>10}{'failed':>8}{'settled':>9}{'revenue':>10}{'discount':>10}", file=out)
+    for day, row in report["days"].items():
+        print(f"{day:<12}{row['generated']:>10}{row['generate_failed']:>8}{row['settled']:>9}"
+              f"{row['revenue']:>10.0f}{row['discount']:>10.0f}", file=out)
+
+    print("\n== Discounts by credential type ==", file=out)
+    print(f"{'credentialType':<32}{'txns':>7}{'discounted':>12}{'discount':>10}", file=out)
+    for ctype, row in report["credential_types"].items():
+        print(f"{ctype:<32}{row['transactions']:>7}{row['discounted']:>12}{row['discount']:>10.0f}", file=out)
+
+    print("\n== Upstream latency (ms) ==", file=out)
+    print(f"{'event':<12}{'count':>8}" + "".join(f"{'p' + str(p):>9}" for p in PERCENTILES), file=out)
+    for event, row in report["latency_ms"].items():
+        print(f"{event:<12}{row['count']:>8}" + "".join(f"{row['p' + str(p)]:>9.1f}" for p in PERCENTILES), file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the transaction journal.")
+    parser.add_argument("journal", help="path to the journal file (JSON lines)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = summarize(read_entries(args.journal))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Local QR rendering from authUri.
+
+Renders the wallet deep link into PNG or SVG at the size a display asks for,
+instead of relaying the fixed-resolution qrcodeImage from the verifier.
+Rendered variants are kept in a bounded LRU cache keyed by
+(authUri, size, format). Requires the optional `segno` package.
+"""
+import io
+from functools import lru_cache
+
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+MIN_SIZE = 64
+MAX_SIZE = 2048
+DEFAULT_SIZE = 256
+CACHE_SIZE = 256
+
+# Quiet zone (in modules) required by the QR spec
+_BORDER = 4
+
+
+def render_qr(auth_uri: str, size: int = DEFAULT_SIZE, fmt: str = "png") -> bytes:
+    """
+    Render `auth_uri` as a QR code image.
+
+    Args:
+        auth_uri: content to encode (the authUri deep link).
+        size: target edge length in pixels; the image is the largest whole
+            module scale that fits, so it may be slightly smaller.
+        fmt: "png" or "svg".
+
+    Raises:
+        ValueError: empty auth_uri, unknown format or size out of range.
+        ImportError: segno is not installed.
+    """
+    if not auth_uri:
+        raise ValueError("auth_uri is required")
+    fmt = (fmt or "png").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported format {fmt!r}; expected one of {sorted(FORMATS)}")
+    size = int(size)
+    if not MIN_SIZE <= size <= MAX_SIZE:
+        raise ValueError(f"size must be between {MIN_SIZE} and {MAX_SIZE}")
+    return _render_cached(auth_uri, size, fmt)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _render_cached(auth_uri: str, size: int, fmt: str) -> bytes:
+    try:
+        import segno
+    except ImportError as e:
+        raise ImportError("Local QR rendering requires segno: pip install segno") from e
+
+    qr = segno.make(auth_uri, error="m", micro=False)
+    modules, _ = qr.symbol_size(scale=1, border=_BORDER)
+    scale = max(1, size // modules)
+    buf = io.BytesIO()
+    if fmt == "svg":
+        qr.save(buf, kind="svg", scale=scale, border=_BORDER, xmldecl=False)
+    else:
+        qr.save(buf, kind="png", scale=scale, border=_BORDER)
+    return buf.getvalue()
+
+
+def cache_info():
+    """Hit/miss statistics of the rendered-variant cache."""
+    return _render_cached.cache_info()
@@ -0,0 +1,119 @@
+"""
+On-demand CPU profiling of single requests.
+
+A sampler thread snapshots the request thread's Python stack at a fixed
+interval and aggregates the samples as folded stacks
+("outer;inner;leaf count" per line), the input format of flamegraph.pl,
+speedscope and inferno. Nothing runs unless a request is selected, and the
+Flask hooks are only installed when PROFILE_DIR is configured.
+"""
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+PROFILE_HEADER = "X-Profile-Token"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Sample one thread's stack every `interval` seconds until stopped."""
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def write_folded(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def install(app):
+    """
+    Register before/after request hooks on `app` when PROFILE_DIR is set.
+
+    A request is profiled when it carries the X-Profile-Token header matching
+    PROFILE_TOKEN, or at random with probability PROFILE_SAMPLE_RATE. The
+    folded-stack file is written to PROFILE_DIR; token-triggered requests also
+    get its name back in the X-Profile-File response header.
+    """
+    profile_dir = app.config.get("PROFILE_DIR")
+    if not profile_dir:
+        return
+    os.makedirs(profile_dir, exist_ok=True)
+    token = app.config.get("PROFILE_TOKEN") or ""
+    sample_rate = float(app.config.get("PROFILE_SAMPLE_RATE") or 0.0)
+    interval = float(app.config.get("PROFILE_INTERVAL") or 0.001)
+
+    from flask import g, request
+
+    @app.before_request
+    def _start_profiling():
+        supplied = request.headers.get(PROFILE_HEADER)
+        # Compare bytes: compare_digest rejects non-ASCII str, and header
+        # values arrive latin-1 decoded
+        by_token = bool(token and supplied and hmac.compare_digest(
+            supplied.encode("latin-1", "replace"), token.encode("utf-8")))
+        if by_token or (sample_rate and random.random() < sample_rate):
+            g.profile_requested = by_token
+            g.profile_sampler = StackSampler(threading.get_ident(), interval).start()
+
+    @app.after_request
+    def _stop_profiling(response):
+        sampler = g.pop("profile_sampler", None)
+        if sampler is None:
+            return response
+        endpoint = re.sub(r"[^A-Za-z0-9_.-]", "_", request.endpoint or "unknown")
+        filename = f"{time.strftime('%Y%m%d_%H%M%S')}_{endpoint}_{uuid.uuid4().hex[:8]}.folded"
+
+        def write_profile():
+            sampler.stop()
+            try:
+                sampler.write_folded(os.path.join(profile_dir, filename))
+            except OSError as e:
+                app.logger.warning(f"profile write failed: {e}")
+                return False
+            return True
+
+        if response.is_streamed:
+            # The body is produced after this hook (stream_with_context), so
+            # keep sampling until the server closes the response.
+            response.call_on_close(write_profile)
+        elif not write_profile():
+            return response
+        if g.pop("profile_requested", False):
+            response.headers["X-Profile-File"] = filename
+        return response
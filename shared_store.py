@@ -0,0 +1,192 @@
+"""
+Expiring key/value store shared by every worker process on a host.
+
+Backed by a small SQLite file (WAL mode) so gunicorn workers see each other's
+entries without an extra service. Entries carry an absolute expiry; the table
+is pruned on write and capped at `max_entries` (oldest expiry evicted first).
+
+Besides plain get/set, `claim` inserts a *pending* marker only if the key is
+free, which lets one process own a piece of work while others `wait` for its
+result; `keep_claimed` renews the marker for as long as the work runs.
+
+The file is created on first use, readable by the owner only.
+
+LocalExpiringStore offers the same get/set interface inside one process, for
+data that should never reach the disk.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    pending INTEGER NOT NULL DEFAULT 0,
+    expires_at REAL NOT NULL
+)
+"""
+
+
+class SharedExpiringStore:
+    """
+    Args:
+        path: SQLite file; must be the same path for all workers.
+        max_entries: upper bound on stored rows.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, re-opened after fork (SQLite handles must
+        # not be shared across processes).
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            self._create_file()
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _create_file(self):
+        # SQLite gives the -wal/-shm files the database file's permissions
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        os.close(os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600))
+
+    def get(self, key: str):
+        """Stored value, or None when missing, expired or still pending."""
+        row = self._conn().execute(
+            "SELECT value FROM entries WHERE key = ? AND pending = 0 AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value, ttl: float):
+        """Store a JSON-serializable value (replacing any pending marker)."""
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, pending, expires_at) VALUES (?, ?, 0, ?)",
+            (key, json.dumps(value, ensure_ascii=False), time.time() + ttl),
+        )
+        self._prune(conn)
+
+    def claim(self, key: str, ttl: float) -> bool:
+        """
+        Mark `key` as in progress for up to `ttl` seconds.
+
+        Returns True if this caller now owns the key, False if another caller
+        holds it or a value is already stored.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM entries WHERE key = ? AND expires_at <= ?", (key, now))
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO entries (key, value, pending, expires_at) VALUES (?, NULL, 1, ?)",
+                (key, now + ttl),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cur.rowcount == 1
+
+    def renew(self, key: str, ttl: float) -> bool:
+        """Extend a pending claim on `key` to `ttl` seconds from now."""
+        cur = self._conn().execute(
+            "UPDATE entries SET expires_at = ? WHERE key = ? AND pending = 1",
+            (time.time() + ttl, key),
+        )
+        return cur.rowcount == 1
+
+    @contextmanager
+    def keep_claimed(self, key: str, ttl: float):
+        """Renew the claim on `key` every `ttl / 3` seconds until the block exits."""
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(ttl / 3):
+                self.renew(key, ttl)
+
+        renewer = threading.Thread(target=renew, name="claim-renewer", daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            renewer.join()
+
+    def release(self, key: str):
+        """Drop a pending marker so the next caller can claim the key."""
+        self._conn().execute("DELETE FROM entries WHERE key = ? AND pending = 1", (key,))
+
+    def wait(self, key: str, timeout: float, poll_interval: float = 0.05):
+        """
+        Wait for a pending `key` to be resolved.
+
+        Returns the stored value, or None if the owner released the key, the
+        claim expired, or `timeout` elapsed.
+        """
+        deadline = time.monotonic() + timeout
+        conn = self._conn()
+        while True:
+            row = conn.execute(
+                "SELECT value, pending FROM entries WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                return None
+            if not row[1]:
+                return json.loads(row[0])
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def _prune(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        # Pending markers guard in-flight work and expire on their own; evicting
+        # them would let a duplicate claim the key and repeat the work.
+        conn.execute(
+            "DELETE FROM entries WHERE key IN ("
+            " SELECT key FROM entries WHERE pending = 0 ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+class LocalExpiringStore:
+    """In-process, size-bounded get/set store; expired entries are dropped when read."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[1] <= time.time():
+                del self._items[key]
+                return None
+            return item[0]
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._items[key] = (value, time.time() + ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
@@ -1,12 +1,7 @@
 #!/bin/bash
 # Production startup script using Gunicorn
 
-# 啟動 Gunicorn WSGI server
-gunicorn \
-    --bind 127.0.0.1:5001 \
-    --workers 4 \
-    --timeout 120 \
-    --access-logfile logs/access.log \
-    --error-logfile logs/error.log \
-    --log-level info \
-    generate_qrcode_api:app
+mkdir -p logs
+
+# 啟動 Gunicorn WSGI server (設定見 gunicorn.conf.py，使用 create_app() 並 preload)
+gunicorn -c gunicorn.conf.py
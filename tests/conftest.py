@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path as _Path
+
+import pytest
+
+# Ensure repo root is importable
+_REPO_ROOT = str(_Path(__file__).resolve().parents[1])
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+import verifier_pool  # noqa: E402
+from generate_qrcode_api import create_app  # noqa: E402
+
+
+class FakeVerifier:
+    """
+    Stands in for the verifier's result endpoint behind the real VerifierPool
+    (so pool spans and pins still happen). Set `result`, or `error` to raise.
+    """
+
+    def __init__(self):
+        self.result = None
+        self.error = None
+        self.calls = 0
+        self.sent_headers = []
+
+    def get_verification_result(self, transaction_id, access_token, extra_headers=None, **kwargs):
+        self.calls += 1
+        self.sent_headers.append(extra_headers)
+        if self.error is not None:
+            raise self.error
+        verifier_pool._last_response.status = 200
+        return self.result
+
+
+@pytest.fixture
+def fake_verifier(monkeypatch):
+    fake = FakeVerifier()
+    monkeypatch.setattr(verifier_pool, "get_verification_result", fake.get_verification_result)
+    return fake
+
+
+@pytest.fixture
+def make_app(tmp_path, fake_verifier):
+    """create_app() with test credentials and a private store; keyword overrides are merged in."""
+    def make(**overrides):
+        return create_app({
+            "IRIS_ACCESS_TOKEN": "t", "API_KEY": "k", "SHARED_STORE_PATH": str(tmp_path / "s.sqlite3"),
+            **overrides,
+        })
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
@@ -0,0 +1,49 @@
+import pytest
+
+VERIFIED = {
+    "verifyResult": True,
+    "transactionId": "tid-1",
+    "data": [{"credentialType": "00000000_irisstudent", "claims": [{"ename": "name", "value": "x" * 200}]}],
+}
+HEADERS = {"X-API-Key": "k"}
+
+
+@pytest.fixture
+def client(app, fake_verifier):
+    fake_verifier.result = VERIFIED
+    return app.test_client()
+
+
+def test_full_result_is_unchanged_without_fields(client):
+    resp = client.post("/api/result", json={"transactionId": "tid-1"}, headers=HEADERS)
+    assert resp.status_code == 200
+    assert resp.get_json() == VERIFIED
+    assert "Accept" in resp.headers["Vary"]
+
+
+def test_fields_projection(client):
+    resp = client.post("/api/result?fields=verifyResult,discount", json={"transactionId": "tid-1"}, headers=HEADERS)
+    assert resp.get_json() == {
+        "verifyResult": True,
+        "discount": {"amount": 100.0, "discount": 10.0, "note": "-10%", "total": 90.0},
+    }
+
+    resp = client.post("/api/result", json={"transactionId": "tid-1", "fields": ["identity", "credentialTypes"]},
+                       headers=HEADERS)
+    assert resp.get_json() == {"identity": "學生", "credentialTypes": ["00000000_irisstudent"]}
+
+    resp = client.post("/api/result", json={"transactionId": "tid-1", "fields": ["nope"]}, headers=HEADERS)
+    assert resp.status_code == 400
+    assert "verifyResult" in resp.get_json()["available"]
+
+
+def test_msgpack_negotiation(client):
+    msgpack = pytest.importorskip("msgpack")
+    resp = client.post("/api/result", json={"transactionId": "tid-1", "fields": ["verifyResult", "identity"]},
+                       headers={**HEADERS, "Accept": "application/msgpack"})
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/msgpack"
+    assert msgpack.unpackb(resp.data) == {"verifyResult": True, "identity": "學生"}
+
+    resp = client.post("/api/result", json={"transactionId": "tid-1"}, headers={**HEADERS, "Accept": "text/csv"})
+    assert resp.status_code == 406
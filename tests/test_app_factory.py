@@ -0,0 +1,52 @@
+import gc
+import subprocess
+import sys
+from pathlib import Path as _Path
+
+import pytest
+
+from generate_qrcode_api import create_app
+
+_REPO_ROOT = str(_Path(__file__).resolve().parents[1])
+
+TEST_CONFIG = {"IRIS_ACCESS_TOKEN": "test-access-token", "API_KEY": "test-api-key"}
+
+
+@pytest.fixture
+def config(tmp_path):
+    return {**TEST_CONFIG, "SHARED_STORE_PATH": str(tmp_path / "s.sqlite3")}
+
+
+def test_import_does_not_load_heavy_dependencies():
+    code = (
+        "import sys, generate_qrcode_api\n"
+        "heavy = {'flask_limiter', 'flask_cors', 'requests', 'dotenv'} & set(sys.modules)\n"
+        "print(sorted(heavy))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=_REPO_ROOT, env={}, check=True,
+        capture_output=True, text=True,
+    ).stdout.strip()
+    assert out == "[]"
+
+
+def test_create_app_requires_credentials():
+    with pytest.raises(ValueError):
+        create_app({"IRIS_ACCESS_TOKEN": "x"})
+
+
+def test_create_app_uses_config_for_api_key(config):
+    client = create_app(config).test_client()
+    assert client.get("/health").data == b"ok"
+    resp = client.post("/api/result", json={}, headers={"X-API-Key": "wrong"})
+    assert resp.status_code == 401
+    resp = client.post("/api/result", json={}, headers={"X-API-Key": "test-api-key"})
+    assert resp.status_code == 400
+
+
+def test_rate_limited_routes_work_with_limiter_disabled(config):
+    # Route limits hold only a weak proxy to the limiter; create_app must keep it alive
+    client = create_app({**config, "RATELIMIT_ENABLED": False}).test_client()
+    gc.collect()
+    resp = client.post("/api/result", json={}, headers={"X-API-Key": "test-api-key"})
+    assert resp.status_code == 400
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+import generate_qrcode_bulk
+
+PNG_B64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR4nGNgYAAAAAMAASsJTYQAAAAASUVORK5CYII="
+
+
+def test_bulk_run_writes_pngs_and_resumes(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_get_qrcode_image(ref, access_token, transaction_id, verbose=True):
+        calls.append(ref)
+        if ref == "bad":
+            return None
+        return {"transactionId": transaction_id, "authUri": "modadigitalwallet://x", "qrcodeImage": PNG_B64}
+
+    monkeypatch.setattr(generate_qrcode_bulk, "get_qrcode_image", fake_get_qrcode_image)
+    sink = generate_qrcode_bulk._DirectorySink(str(tmp_path))
+    items = list(generate_qrcode_bulk.expand_items(["good:3", "bad"]))
+
+    stats = generate_qrcode_bulk.run(items, sink, "token", workers=2, progress=None)
+    assert stats == {"ok": 3, "failed": 1, "skipped": 0}
+    assert sorted(p.name for p in tmp_path.glob("*.png")) == ["good-0000.png", "good-0001.png", "good-0002.png"]
+
+    # Only the failed item is retried on the second run
+    calls.clear()
+    stats = generate_qrcode_bulk.run(items, sink, "token", workers=2, progress=None)
+    assert calls == ["bad"]
+    assert stats["skipped"] == 3
+    lines = (tmp_path / "manifest.jsonl").read_text(encoding="utf-8").splitlines()
+    assert sum(json.loads(line)["status"] == "ok" for line in lines) == 3
+
+    # Skips only count items of the current run
+    stats = generate_qrcode_bulk.run(items[:1], sink, "token", workers=2, progress=None)
+    assert stats == {"ok": 0, "failed": 0, "skipped": 1}
+
+
+def test_expand_items_dedupes_and_rejects_bad_counts():
+    items = list(generate_qrcode_bulk.expand_items(["a:2", "a:3", "b"]))
+    assert [item_id for item_id, _ in items] == ["a-0000", "a-0001", "a-0002", "b-0000"]
+    with pytest.raises(SystemExit):
+        generate_qrcode_bulk.main(["a:x"])
+
+
+def test_bulk_run_records_item_exceptions_and_retries_them(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_get_qrcode_image(ref, access_token, transaction_id, verbose=True):
+        calls.append(ref)
+        if ref == "boom" and calls.count("boom") == 1:
+            return ["not", "a", "dict"]  # api_resp.get(...) raises
+        return {"transactionId": transaction_id, "authUri": "modadigitalwallet://x", "qrcodeImage": PNG_B64}
+
+    monkeypatch.setattr(generate_qrcode_bulk, "get_qrcode_image", fake_get_qrcode_image)
+    sink = generate_qrcode_bulk._DirectorySink(str(tmp_path))
+    items = list(generate_qrcode_bulk.expand_items(["good:2", "boom"]))
+
+    stats = generate_qrcode_bulk.run(items, sink, "token", workers=2, progress=None)
+    assert stats == {"ok": 2, "failed": 1, "skipped": 0}
+    entries = [json.loads(line) for line in (tmp_path / "manifest.jsonl").read_text(encoding="utf-8").splitlines()]
+    failed = [e for e in entries if e["status"] == "failed"]
+    assert failed[0]["id"] == "boom-0000" and "AttributeError" in failed[0]["error"]
+
+    stats = generate_qrcode_bulk.run(items, sink, "token", workers=2, progress=None)
+    assert stats == {"ok": 1, "failed": 0, "skipped": 2}
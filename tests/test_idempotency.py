@@ -0,0 +1,81 @@
+import threading
+import time
+
+from shared_store import SharedExpiringStore
+
+HEADERS = {"X-API-Key": "k"}
+
+
+def _make_client(make_app, monkeypatch, delay=0.0):
+    calls = []
+
+    def fake_get_qrcode_image(ref, transaction_id):
+        calls.append(transaction_id)
+        time.sleep(delay)
+        return {"transactionId": transaction_id, "authUri": "modadigitalwallet://x"}
+
+    app = make_app(RATELIMIT_ENABLED=False)
+    monkeypatch.setattr(app.extensions["verifier"], "get_qrcode_image", fake_get_qrcode_image)
+    return app.test_client(), calls
+
+
+def test_shared_store_claim_and_expiry(tmp_path):
+    store = SharedExpiringStore(str(tmp_path / "s.sqlite3"))
+    assert store.claim("a", ttl=10) is True
+    assert store.claim("a", ttl=10) is False
+    assert store.get("a") is None  # pending
+    store.set("a", {"v": 1}, ttl=10)
+    assert store.wait("a", timeout=0) == {"v": 1}
+    store.set("b", 2, ttl=-1)
+    assert store.get("b") is None
+    assert store.claim("b", ttl=10) is True
+
+
+def test_repeat_with_same_key_replays_response(make_app, monkeypatch):
+    client, calls = _make_client(make_app, monkeypatch)
+    headers = {**HEADERS, "Idempotency-Key": "retry-1"}
+    first = client.post("/api/generate_by_ref", json={"ref": "00000000_irisstudent"}, headers=headers)
+    second = client.post("/api/generate_by_ref", json={"ref": "00000000_irisstudent"}, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert first.get_json() == second.get_json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert len(calls) == 1
+
+    other = client.post("/api/generate_by_ref", json={"ref": "00000000_irisold"}, headers=headers)
+    assert other.status_code == 422
+
+
+def test_concurrent_duplicates_wait_for_first_request(make_app, monkeypatch):
+    client, calls = _make_client(make_app, monkeypatch, delay=0.3)
+    headers = {**HEADERS, "Idempotency-Key": "retry-2"}
+    results = []
+
+    def send():
+        resp = client.post("/api/generate_by_ref", json={"ref": "00000000_irisstudent"}, headers=headers)
+        results.append((resp.status_code, resp.get_json()["transactionId"]))
+
+    threads = [threading.Thread(target=send) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [(200, calls[0])] * 4
+
+
+def test_pending_claims_survive_renewal_and_size_cap(tmp_path):
+    store = SharedExpiringStore(str(tmp_path / "s.sqlite3"), max_entries=2)
+    assert store.claim("in-flight", ttl=0.3)
+    with store.keep_claimed("in-flight", ttl=0.3):
+        for i in range(5):
+            store.set(f"k{i}", i, ttl=60)
+        time.sleep(0.5)
+        # Renewed past its original expiry and not evicted by the cap
+        assert store.claim("in-flight", ttl=10) is False
+    assert store.get("k4") == 4 and store.get("k0") is None
+    assert (tmp_path / "s.sqlite3").stat().st_mode & 0o777 == 0o600
+
+
+def test_store_is_opened_lazily(tmp_path):
+    SharedExpiringStore(str(tmp_path / "sub" / "s.sqlite3"))
+    assert not (tmp_path / "sub").exists()
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("segno")
+
+from qr_render import cache_info, render_qr  # noqa: E402
+
+AUTH_URI = "modadigitalwallet://authorize?request_uri=https://example.test/request/1"
+
+
+def test_render_qr_formats_and_cache():
+    png = render_qr(AUTH_URI, 200, "png")
+    assert png.startswith(b"\x89PNG")
+    assert render_qr(AUTH_URI, 200, "svg").lstrip().startswith(b"<svg")
+    hits = cache_info().hits
+    assert render_qr(AUTH_URI, 200, "png") is png
+    assert cache_info().hits == hits + 1
+
+
+def test_render_qr_rejects_bad_arguments():
+    with pytest.raises(ValueError):
+        render_qr(AUTH_URI, 200, "gif")
+    with pytest.raises(ValueError):
+        render_qr(AUTH_URI, 10_000, "png")
+
+
+def test_view_qrcode_served_by_any_worker(make_app, monkeypatch):
+    # Two apps on one store stand in for two gunicorn workers
+    worker_a, worker_b = make_app(RATELIMIT_ENABLED=False), make_app()
+    monkeypatch.setattr(worker_a.extensions["verifier"], "get_qrcode_image",
+                        lambda ref, transaction_id: {"transactionId": transaction_id, "authUri": AUTH_URI})
+    tid = worker_a.test_client().post(
+        "/api/generate_by_ref", json={"ref": "00000000_irisstudent"}, headers={"X-API-Key": "k"}
+    ).get_json()["transactionId"]
+
+    client = worker_b.test_client()
+    resp = client.get(f"/view/qrcode?transactionId={tid}&size=128&format=svg")
+    assert resp.status_code == 200 and resp.mimetype == "image/svg+xml"
+    assert client.get("/view/qrcode?size=128").status_code == 400
+    assert client.get("/view/qrcode?transactionId=other").status_code == 404
@@ -0,0 +1,37 @@
+import time
+
+
+def _slow_result(transaction_id):
+    time.sleep(0.05)
+    return None
+
+
+def test_profile_written_only_for_token_requests(tmp_path, make_app, monkeypatch):
+    profile_dir = tmp_path / "profiles"
+    app = make_app(PROFILE_DIR=str(profile_dir), PROFILE_TOKEN="secret")
+    monkeypatch.setattr(app.extensions["verifier"], "get_verification_result", _slow_result)
+    client = app.test_client()
+
+    resp = client.get("/view/result?transactionId=abc", headers={"X-Profile-Token": "wrong"})
+    assert "X-Profile-File" not in resp.headers
+    resp = client.get("/health", headers={"X-Profile-Token": "sécret"})
+    assert resp.status_code == 200 and "X-Profile-File" not in resp.headers
+    assert list(profile_dir.iterdir()) == []
+
+    resp = client.get("/view/result?transactionId=abc", headers={"X-Profile-Token": "secret"})
+    folded = (profile_dir / resp.headers["X-Profile-File"]).read_text(encoding="utf-8")
+    assert "_slow_result" in folded
+    stack, count = folded.splitlines()[0].rsplit(" ", 1)
+    assert ";" in stack and int(count) > 0
+
+    # Streamed pages call the verifier after the view returns
+    resp = client.get("/view/result?transactionId=abc&stream=1", headers={"X-Profile-Token": "secret"})
+    resp.get_data()
+    resp.close()
+    folded = (profile_dir / resp.headers["X-Profile-File"]).read_text(encoding="utf-8")
+    assert "_slow_result" in folded
+
+
+def test_profiling_hooks_absent_when_disabled(app):
+    hooks = [f.__name__ for f in app.before_request_funcs.get(None, [])]
+    assert "_start_profiling" not in hooks
@@ -0,0 +1,50 @@
+from transaction_journal import read_entries
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+
+def test_request_spans_exported_and_propagated(tmp_path, make_app, fake_verifier):
+    fake_verifier.result = {"verifyResult": True, "data": [{"credentialType": "00000000_irisstudent"}]}
+    trace_file = tmp_path / "spans.jsonl"
+    app = make_app(TRACE_EXPORT_PATH=str(trace_file))
+    client = app.test_client()
+
+    resp = client.post(
+        "/api/result", json={"transactionId": "tid-1"},
+        headers={"X-API-Key": "k", "traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01"},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["X-Trace-Id"] == TRACE_ID
+    client.get("/view/result?transactionId=tid-1")
+    app.extensions["tracer"].exporter.close()
+
+    spans = list(read_entries(str(trace_file)))
+    by_name = {}
+    for span in spans:
+        by_name.setdefault(span["name"], []).append(span)
+    api_root = by_name["POST /api/result"][0]
+    assert api_root["traceId"] == TRACE_ID and api_root["parentId"] == "00f067aa0ba902b7"
+    for name in ("rate_limit", "api_key_check", "verifier.get_verification_result",
+                 "extract_claims", "render_html"):
+        assert name in by_name, name
+
+    verifier_span = by_name["verifier.get_verification_result"][0]
+    assert verifier_span["kind"] == "CLIENT"
+    assert fake_verifier.sent_headers[0] == {"traceparent": f"00-{TRACE_ID}-{verifier_span['id']}-01"}
+    # api_key_check runs after (not inside) the rate_limit span
+    assert by_name["api_key_check"][0]["parentId"] == api_root["id"]
+
+
+def test_streamed_response_spans_stay_in_request_trace(tmp_path, make_app):
+    trace_file = tmp_path / "spans.jsonl"
+    app = make_app(TRACE_EXPORT_PATH=str(trace_file))
+    resp = app.test_client().get("/view/result?transactionId=tid-1&stream=1")
+    resp.get_data()
+    resp.close()
+    app.extensions["tracer"].exporter.close()
+
+    by_name = {span["name"]: span for span in read_entries(str(trace_file))}
+    root = by_name["GET /view/result"]
+    # The verifier call and rendering happen while streaming, after teardown
+    for name in ("verifier.get_verification_result", "render_html"):
+        assert by_name[name]["parentId"] == root["id"], name
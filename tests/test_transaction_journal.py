@@ -0,0 +1,44 @@
+import gc
+import weakref
+
+from journal_report import summarize
+from transaction_journal import AppendOnlyJournal, read_entries
+
+
+def test_journal_round_trip(tmp_path):
+    path = tmp_path / "logs" / "journal.jsonl"
+    journal = AppendOnlyJournal(str(path), batch_size=2, flush_interval=0.05)
+    for i in range(5):
+        journal.record({"event": "generate", "i": i})
+    journal.close()
+    assert [e["i"] for e in read_entries(str(path))] == [0, 1, 2, 3, 4]
+
+
+def test_closed_journal_is_not_kept_alive(tmp_path):
+    journal = AppendOnlyJournal(str(tmp_path / "journal.jsonl"))
+    journal.record({"event": "generate"})
+    journal.close()
+    ref = weakref.ref(journal)
+    del journal
+    gc.collect()
+    assert ref() is None
+
+
+def test_summarize_counts_each_transaction_once():
+    ts = 1_760_000_000
+    entries = [
+        {"ts": ts, "event": "generate", "transactionId": "t1", "ok": True, "latency_ms": 120},
+        {"ts": ts, "event": "result", "transactionId": "t1", "status": "pending", "latency_ms": 80},
+        {"ts": ts, "event": "result", "transactionId": "t1", "status": "verified", "total": 90.0,
+         "discount": 10.0, "credentialTypes": ["00000000_irisstudent"], "latency_ms": 100},
+        # POS reload of the same settled transaction
+        {"ts": ts, "event": "result", "transactionId": "t1", "status": "verified", "total": 90.0,
+         "discount": 10.0, "credentialTypes": ["00000000_irisstudent"], "latency_ms": 90},
+    ]
+    report = summarize(entries)
+    (day,) = report["days"].values()
+    assert day["generated"] == 1 and day["settled"] == 1
+    assert day["revenue"] == 90.0 and day["discount"] == 10.0
+    assert report["credential_types"]["00000000_irisstudent"]["discounted"] == 1
+    assert report["latency_ms"]["result"]["count"] == 3
+    assert 99 <= report["latency_ms"]["result"]["p99"] <= 102
@@ -0,0 +1,95 @@
+import gc
+import time
+import weakref
+
+import verifier_pool
+from verifier_pool import VerifierEndpoint, VerifierPool
+
+
+def _fake_http(statuses):
+    """Stand-ins for the generate_qrcode calls; `statuses` maps endpoint URL -> HTTP status."""
+    calls = []
+
+    def fake_get_qrcode_image(ref, token, transaction_id, session=None, url=None, **kwargs):
+        calls.append(("qrcode", url, token))
+        status = statuses[url.split("/api/")[0]]
+        if status is None:
+            return None  # connection error: no response seen
+        verifier_pool._last_response.status = status
+        return {"transactionId": transaction_id} if status == 200 else None
+
+    def fake_get_verification_result(transaction_id, token, session=None, url=None, **kwargs):
+        calls.append(("result", url, token))
+        status = statuses.get("result", 200)
+        verifier_pool._last_response.status = status
+        return {"verifyResult": True} if status == 200 else None
+
+    return calls, fake_get_qrcode_image, fake_get_verification_result
+
+
+def _pool(**kwargs):
+    return VerifierPool(
+        [VerifierEndpoint("a", "https://a.test", "token-a"), VerifierEndpoint("b", "https://b.test", "token-b")],
+        **kwargs,
+    )
+
+
+def test_failover_ejection_and_result_pinning(monkeypatch):
+    statuses = {"https://a.test": None, "https://b.test": 200}
+    calls, fake_qr, fake_result = _fake_http(statuses)
+    monkeypatch.setattr(verifier_pool, "get_qrcode_image", fake_qr)
+    monkeypatch.setattr(verifier_pool, "get_verification_result", fake_result)
+    pool = _pool(eject_after=2)
+
+    for i in range(4):
+        assert pool.get_qrcode_image("ref", f"tid-{i}") == {"transactionId": f"tid-{i}"}
+    by_name = {ep.name: ep for ep in pool.endpoints}
+    assert not by_name["a"].is_available(time.monotonic())
+    # Once ejected, "a" is skipped entirely
+    calls.clear()
+    pool.get_qrcode_image("ref", "tid-x")
+    assert [c[1] for c in calls] == ["https://b.test/api/oidvp/qrcode"]
+
+    # The result lookup goes to the endpoint (and token) that created the transaction
+    calls.clear()
+    pool.get_verification_result("tid-x")
+    assert calls == [("result", "https://b.test/api/oidvp/result", "token-b")]
+
+
+def test_client_errors_do_not_fail_over(monkeypatch):
+    statuses = {"https://a.test": 400, "https://b.test": 400}
+    calls, fake_qr, fake_result = _fake_http(statuses)
+    monkeypatch.setattr(verifier_pool, "get_qrcode_image", fake_qr)
+    pool = _pool()
+    assert pool.get_qrcode_image("bad-ref", "tid") is None
+    assert len(calls) == 1
+    assert all(ep.consecutive_failures == 0 for ep in pool.endpoints)
+
+
+def test_bad_token_endpoint_fails_over_and_is_ejected(monkeypatch):
+    statuses = {"https://a.test": 401, "https://b.test": 200}
+    calls, fake_qr, fake_result = _fake_http(statuses)
+    monkeypatch.setattr(verifier_pool, "get_qrcode_image", fake_qr)
+    monkeypatch.setattr(verifier_pool, "get_verification_result", fake_result)
+    pool = _pool(eject_after=2)
+
+    for i in range(20):
+        assert pool.get_qrcode_image("ref", f"tid-{i}") == {"transactionId": f"tid-{i}"}
+    by_name = {ep.name: ep for ep in pool.endpoints}
+    # Fast 401s neither look like low latency nor keep "a" in rotation
+    assert by_name["a"].latency_ewma is None
+    assert not by_name["a"].is_available(time.monotonic())
+    assert sum(c[1].startswith("https://a.test") for c in calls) == 2
+
+    # A pending result (400) is a healthy reply from the pinned endpoint
+    statuses["result"] = 400
+    assert pool.get_verification_result("tid-0") is None
+    assert by_name["b"].consecutive_failures == 0
+
+
+def test_endpoints_are_not_kept_alive_by_fork_hook():
+    endpoint = VerifierEndpoint("a", "https://a.test", "tok")
+    ref = weakref.ref(endpoint)
+    del endpoint
+    gc.collect()
+    assert ref() is None
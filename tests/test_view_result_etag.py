@@ -0,0 +1,27 @@
+VERIFIED = {"verifyResult": True, "data": [{"credentialType": "00000000_irisstudent"}]}
+
+
+def test_etag_revalidation_and_pending_to_verified(app, fake_verifier):
+    client = app.test_client()
+    url = "/view/result?transactionId=tid-1"
+
+    pending = client.get(url)
+    assert pending.status_code == 200 and pending.headers["ETag"]
+    assert "no-store" not in pending.headers["Cache-Control"]
+    again = client.get(url, headers={"If-None-Match": pending.headers["ETag"]})
+    assert again.status_code == 304 and again.data == b""
+
+    # As soon as the result is verified the old ETag no longer matches
+    fake_verifier.result = VERIFIED
+    verified = client.get(url, headers={"If-None-Match": pending.headers["ETag"]})
+    assert verified.status_code == 200
+    assert "學生" in verified.get_data(as_text=True)
+    assert verified.headers["ETag"] != pending.headers["ETag"]
+
+    # Verified results are cached: revalidation needs no verifier call
+    calls = fake_verifier.calls
+    cached = client.get(url, headers={"If-None-Match": verified.headers["ETag"]})
+    assert cached.status_code == 304
+    assert fake_verifier.calls == calls
+    # Claims stay in memory, never in the on-disk shared store
+    assert app.extensions["shared_store"].get("result:tid-1") is None
@@ -0,0 +1,30 @@
+from generate_qrcode_api import _PAGE_HEAD
+
+VERIFIED = {"verifyResult": True, "data": [{"credentialType": "00000000_irisstudent"}]}
+
+
+def test_streamed_page_matches_buffered_page(app, fake_verifier):
+    client = app.test_client()
+
+    # The head is produced before the verifier is asked
+    streamed = client.get("/view/result?transactionId=tid-1&stream=1", buffered=False)
+    chunks = streamed.response
+    assert next(chunks) == _PAGE_HEAD.encode("utf-8")
+    assert fake_verifier.calls == 0
+    pending = b"".join(chunks)
+    streamed.close()
+    assert fake_verifier.calls == 1
+    assert streamed.headers["Cache-Control"].startswith("no-store")
+    assert _PAGE_HEAD.encode("utf-8") + pending == client.get("/view/result?transactionId=tid-1").data
+
+    fake_verifier.result = VERIFIED
+    streamed = client.get("/view/result?transactionId=tid-1&stream=1")
+    assert "學生" in streamed.get_data(as_text=True)
+    assert streamed.data == client.get("/view/result?transactionId=tid-1").data
+
+
+def test_stream_falls_back_to_waiting_page_on_error(app, fake_verifier):
+    fake_verifier.error = TimeoutError("verifier timed out")
+    resp = app.test_client().get("/view/result?transactionId=tid-1&stream=1")
+    assert resp.status_code == 200
+    assert "等待驗證結果" in resp.get_data(as_text=True)
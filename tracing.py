@@ -0,0 +1,265 @@
+"""
+Lightweight span tracing for the POS backend.
+
+Spans are kept in a context variable for the duration of a request and, when
+finished, handed to an exporter in Zipkin v2 JSON (accepted by Zipkin,
+Jaeger and the OpenTelemetry collector's zipkin receiver):
+
+* ZipkinFileExporter: one span per line appended to a local file;
+* ZipkinHttpExporter: batched POSTs to a collector, e.g.
+  http://localhost:9411/api/v2/spans.
+
+Trace context follows W3C Trace Context: an incoming `traceparent` header
+continues the caller's trace, and `propagation_headers()` yields the header
+to send upstream. When no trace is active every helper is a cheap no-op.
+"""
+import contextvars
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from transaction_journal import AppendOnlyJournal, BatchedWriter
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "kind", "tags",
+                 "start", "_t0", "duration", "_token")
+
+    def __init__(self, tracer, trace_id, parent_id, name, kind=None, tags=None):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.tags = dict(tags or {})
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration = None
+        self._token = None
+
+    @property
+    def finished(self) -> bool:
+        return self.duration is not None
+
+    def set_tag(self, key, value):
+        self.tags[key] = value
+
+    def to_zipkin(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "id": self.span_id,
+            "name": self.name,
+            "timestamp": int(self.start * 1_000_000),
+            "duration": max(1, int(self.duration * 1_000_000)),
+            "localEndpoint": {"serviceName": self.tracer.service_name},
+            "tags": {k: str(v) for k, v in self.tags.items()},
+        }
+        if self.parent_id:
+            span["parentId"] = self.parent_id
+        if self.kind:
+            span["kind"] = self.kind
+        return span
+
+
+class Tracer:
+    def __init__(self, exporter, service_name: str = "uuse-pos", sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.service_name = service_name
+        self.sample_rate = sample_rate
+
+    def start_trace(self, name: str, traceparent: str = None, **tags):
+        """Start the root span of a request (or None when not sampled)."""
+        match = _TRACEPARENT.match(traceparent or "")
+        if match:
+            if not int(match.group(3), 16) & 1:
+                return None  # caller decided not to sample
+            trace_id, parent_id = match.group(1), match.group(2)
+        else:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return None
+            trace_id, parent_id = os.urandom(16).hex(), None
+        span = Span(self, trace_id, parent_id, name, kind="SERVER", tags=tags)
+        span._token = _current_span.set(span)
+        return span
+
+
+def current_span():
+    return _current_span.get()
+
+
+def start_span(name: str, kind: str = None, **tags):
+    """Start a child of the current span; returns None when no trace is active."""
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    span = Span(parent.tracer, parent.trace_id, parent.span_id, name, kind=kind, tags=tags)
+    span._token = _current_span.set(span)
+    return span
+
+
+def finish(span):
+    """End `span`, restore its parent as current and export it."""
+    if span is None or span.finished:
+        return
+    span.duration = time.perf_counter() - span._t0
+    try:
+        _current_span.reset(span._token)
+    except ValueError:
+        # Finished from another context (e.g. a streamed response); just drop it
+        pass
+    span.tracer.exporter.record(span.to_zipkin())
+
+
+@contextmanager
+def span(name: str, kind: str = None, **tags):
+    s = start_span(name, kind=kind, **tags)
+    try:
+        yield s
+    except Exception as e:
+        if s is not None:
+            s.set_tag("error", type(e).__name__)
+        raise
+    finally:
+        finish(s)
+
+
+def traced(name: str):
+    """Decorator form of `span`."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagation_headers() -> dict:
+    """`traceparent` for an outgoing call made inside the current span."""
+    s = _current_span.get()
+    if s is None:
+        return {}
+    return {"traceparent": f"00-{s.trace_id}-{s.span_id}-01"}
+
+
+def traced_gate(name: str, decorator, view):
+    """
+    Apply `decorator` to `view`, tracing the time spent in the decorator
+    before `view` is entered (e.g. a rate-limit check) as span `name`.
+    """
+    @wraps(view)
+    def entered(*args, **kwargs):
+        s = _current_span.get()
+        if s is not None and s.name == name:
+            finish(s)
+        return view(*args, **kwargs)
+
+    gated = decorator(entered)
+
+    @wraps(gated)
+    def outer(*args, **kwargs):
+        s = start_span(name)
+        try:
+            return gated(*args, **kwargs)
+        finally:
+            # Still open when the decorator rejected the request
+            finish(s)
+
+    return outer
+
+
+class ZipkinFileExporter(AppendOnlyJournal):
+    """Zipkin v2 spans, one JSON object per line."""
+
+    thread_name = "trace-file-exporter"
+
+
+class ZipkinHttpExporter(BatchedWriter):
+    """POST batches of Zipkin v2 spans to a collector."""
+
+    thread_name = "trace-http-exporter"
+
+    def __init__(self, url: str, batch_size: int = 64, flush_interval: float = 1.0, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self._session = None
+        super().__init__(batch_size=batch_size, flush_interval=flush_interval)
+
+    def _write_batch(self, batch):
+        if self._session is None:
+            import requests
+
+            self._session = requests.Session()
+        self._session.post(self.url, json=batch, timeout=self.timeout).raise_for_status()
+
+    def _reset_after_fork(self):
+        self._session = None
+        super()._reset_after_fork()
+
+
+def install(app):
+    """
+    Trace every request of `app` when TRACE_EXPORT_PATH or TRACE_COLLECTOR_URL
+    is configured; otherwise do nothing.
+    """
+    if app.config.get("TRACE_COLLECTOR_URL"):
+        exporter = ZipkinHttpExporter(app.config["TRACE_COLLECTOR_URL"])
+    elif app.config.get("TRACE_EXPORT_PATH"):
+        exporter = ZipkinFileExporter(app.config["TRACE_EXPORT_PATH"])
+    else:
+        return
+    tracer = Tracer(exporter, app.config.get("TRACE_SERVICE_NAME") or "uuse-pos",
+                    float(app.config.get("TRACE_SAMPLE_RATE", 1.0)))
+    app.extensions["tracer"] = tracer
+
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_span():
+        # Worker threads are reused; never inherit a span from a previous request
+        _current_span.set(None)
+        g.trace_root = tracer.start_trace(
+            f"{request.method} {request.path}",
+            request.headers.get("traceparent"),
+            **{"http.method": request.method, "http.path": request.path},
+        )
+
+    @app.after_request
+    def _tag_response(response):
+        root = g.get("trace_root")
+        if root is not None:
+            root.set_tag("http.status_code", response.status_code)
+            response.headers["X-Trace-Id"] = root.trace_id
+            if response.is_streamed:
+                # Teardown runs before a streamed body is produced; the
+                # request span ends when the server closes the response.
+                g.pop("trace_root")
+                response.call_on_close(lambda: _finish_root(root))
+        return response
+
+    @app.teardown_request
+    def _finish_request_span(exc):
+        root = g.pop("trace_root", None)
+        if root is None:
+            return
+        if exc is not None:
+            root.set_tag("error", type(exc).__name__)
+        _finish_root(root)
+
+
+def _finish_root(root):
+    # Close anything left open below the root (e.g. after an exception)
+    s = _current_span.get()
+    while s is not None and s is not root and not s.finished:
+        finish(s)
+        s = _current_span.get()
+    finish(root)
+    _current_span.set(None)
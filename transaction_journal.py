@@ -0,0 +1,177 @@
+"""
+Append-only journal of transaction events.
+
+Each event is one compact JSON object per line. Writes are handed to a
+background thread through a queue so the request path never touches the
+disk; the thread writes in batches and fsyncs once per batch.
+"""
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+
+_STOP = object()
+
+# Live writers, for the process-wide exit/fork hooks registered below. Weak so
+# that dropping an app (e.g. in tests) does not keep its writers around.
+_writers = weakref.WeakSet()
+
+
+def _close_all():
+    for writer in list(_writers):
+        writer.close()
+
+
+def _reset_all_after_fork():
+    for writer in list(_writers):
+        writer._reset_after_fork()
+
+
+atexit.register(_close_all)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_all_after_fork)
+
+
+class BatchedWriter(ABC):
+    """
+    Hands records to a background thread that delivers them in batches.
+
+    Subclasses implement `_write_batch(batch)`; it is called from the writer
+    thread with up to `batch_size` records, at least every `flush_interval`
+    seconds while records are pending.
+    """
+
+    thread_name = "batched-writer"
+
+    def __init__(self, batch_size: int = 64, flush_interval: float = 1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        _writers.add(self)
+
+    def record(self, entry: dict):
+        """Queue one entry for writing; never blocks on I/O."""
+        if self._thread is None:
+            self._start()
+        self._queue.put(entry)
+
+    def close(self, timeout: float = 5.0):
+        """Flush pending entries and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._queue = queue.SimpleQueue()
+            self._thread = threading.Thread(
+                target=self._run, args=(self._queue,), name=self.thread_name, daemon=True
+            )
+            self._thread.start()
+
+    def _reset_after_fork(self):
+        # Threads do not survive fork; the child starts its own writer on the
+        # next record().
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+
+    def _run(self, q):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                try:
+                    if deadline is None:
+                        item = q.get()
+                        deadline = time.monotonic() + self.flush_interval
+                    else:
+                        item = q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    # Keep the writer alive; losing a batch beats blocking requests
+                    print(f"{self.thread_name}: dropped {len(batch)} records: {e}", file=sys.stderr)
+        self._close_output()
+
+    @abstractmethod
+    def _write_batch(self, batch):
+        """Deliver `batch` (a list of records); called from the writer thread."""
+
+    def _close_output(self):
+        pass
+
+
+class AppendOnlyJournal(BatchedWriter):
+    """
+    Buffered, batch-fsync'd writer for a line-delimited JSON file.
+
+    Args:
+        path: journal file; parent directories are created on first write.
+        batch_size: flush + fsync after this many records.
+        flush_interval: flush + fsync at least this often (seconds) while
+            records are pending.
+    """
+
+    thread_name = "journal-writer"
+
+    def __init__(self, path: str, batch_size: int = 64, flush_interval: float = 1.0):
+        self.path = path
+        self._file = None
+        super().__init__(batch_size=batch_size, flush_interval=flush_interval)
+
+    def _write_batch(self, batch):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        lines = [json.dumps(item, ensure_ascii=False, separators=(",", ":")) for item in batch]
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _close_output(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _reset_after_fork(self):
+        # The child reopens the file itself; O_APPEND keeps lines from
+        # different workers whole.
+        self._file = None
+        super()._reset_after_fork()
+
+
+def read_entries(path: str):
+    """Stream journal entries one at a time; malformed lines are skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # A crash mid-write can leave a truncated last line
+                continue
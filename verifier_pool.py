@@ -0,0 +1,259 @@
+"""
+Verifier client spread over several endpoints.
+
+Each endpoint has its own access token and HTTP connection pool. New
+transactions go to the healthiest endpoint (lowest latency EWMA, picked with
+power-of-two-choices so workers do not all stampede the same one); endpoints
+that fail repeatedly are ejected for a while (passive outlier detection).
+Result lookups are pinned to the endpoint that created the transaction, since
+only that verifier knows the transactionId.
+"""
+import os
+import random
+import threading
+import time
+import weakref
+from typing import List, Optional
+
+import tracing
+from generate_qrcode import (
+    QRCODE_PATH,
+    RESULT_PATH,
+    VERIFIER_BASE_URL,
+    get_qrcode_image,
+    get_verification_result,
+)
+from shared_store import LocalExpiringStore
+
+# Weight of the newest sample in the latency EWMA
+_EWMA_ALPHA = 0.3
+
+# Replies caused by the request itself (bad ref, unknown transaction): another
+# endpoint would answer the same, and the endpoint is not at fault. Any other
+# non-2xx reply (401/403 from a revoked token, 429, 5xx) is an endpoint failure.
+_REQUEST_ERRORS = frozenset({400, 404, 422})
+
+# The result endpoint answers 400 while the holder has not presented yet
+_RESULT_PENDING = 400
+
+# Live endpoints, so one fork hook can drop every inherited session without
+# keeping discarded pools alive
+_endpoints = weakref.WeakSet()
+
+
+def _reset_all_after_fork():
+    for endpoint in list(_endpoints):
+        endpoint._reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_all_after_fork)
+
+
+class VerifierEndpoint:
+    """One verifier host: its token, connection pool and passive health state."""
+
+    def __init__(self, name: str, base_url: str, access_token: str, pool_size: int = 10):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.access_token = access_token
+        self.pool_size = pool_size
+        self.latency_ewma = None
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self._session = None
+        self._lock = threading.Lock()
+        _endpoints.add(self)
+
+    @property
+    def qrcode_url(self) -> str:
+        return self.base_url + QRCODE_PATH
+
+    @property
+    def result_url(self) -> str:
+        return self.base_url + RESULT_PATH
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.hooks["response"].append(_remember_status)
+                    self._session = session
+        return self._session
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "latency_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "ejected": not self.is_available(time.monotonic()),
+        }
+
+    def _reset_after_fork(self):
+        self._session = None
+        self._lock = threading.Lock()
+
+
+# Status code of the last HTTP response seen by the current thread; lets the
+# pool tell "verifier said 4xx" apart from "connection failed / 5xx" without
+# changing what get_qrcode_image / get_verification_result return.
+_last_response = threading.local()
+
+
+def _remember_status(response, *args, **kwargs):
+    _last_response.status = response.status_code
+
+
+class VerifierPool:
+    """
+    Route verifier calls across endpoints.
+
+    Args:
+        endpoints: at least one VerifierEndpoint.
+        pin_store: where transactionId -> endpoint pins live; anything with
+            get(key) / set(key, value, ttl), e.g. SharedExpiringStore so that
+            every worker can route the lookup. Defaults to an in-process map.
+        pin_ttl: how long a pin is kept (seconds).
+        eject_after: consecutive failures that eject an endpoint.
+        eject_seconds: base ejection time; grows with repeated ejections.
+        timeout: per-request timeout passed to the HTTP calls.
+    """
+
+    def __init__(self, endpoints: List[VerifierEndpoint], pin_store=None, pin_ttl: float = 600,
+                 eject_after: int = 3, eject_seconds: float = 30.0, timeout: Optional[float] = 10.0):
+        if not endpoints:
+            raise ValueError("VerifierPool needs at least one endpoint")
+        self.endpoints = list(endpoints)
+        self._by_name = {ep.name: ep for ep in self.endpoints}
+        self.pin_store = pin_store if pin_store is not None else LocalExpiringStore()
+        self.pin_ttl = pin_ttl
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, endpoints_config, default_token: str, pin_store=None, pool_size: int = 10, **kwargs):
+        """
+        Build from a list of {"name", "url", "token"} dicts. An empty list means
+        the single sandbox verifier with `default_token`.
+        """
+        endpoints = [
+            VerifierEndpoint(
+                ep.get("name") or ep["url"],
+                ep["url"],
+                ep.get("token") or default_token,
+                pool_size=pool_size,
+            )
+            for ep in (endpoints_config or [])
+        ] or [VerifierEndpoint("sandbox", VERIFIER_BASE_URL, default_token, pool_size=pool_size)]
+        return cls(endpoints, pin_store=pin_store, **kwargs)
+
+    def choose(self, exclude=()) -> VerifierEndpoint:
+        """Pick an endpoint for a new transaction."""
+        now = time.monotonic()
+        candidates = [ep for ep in self.endpoints if ep.name not in exclude]
+        if not candidates:
+            candidates = list(self.endpoints)
+        healthy = [ep for ep in candidates if ep.is_available(now)]
+        if not healthy:
+            # Everything is ejected: try the one that comes back first
+            return min(candidates, key=lambda ep: ep.ejected_until)
+        # Endpoints without samples yet are tried first so they get measured
+        unmeasured = [ep for ep in healthy if ep.latency_ewma is None]
+        if unmeasured:
+            return random.choice(unmeasured)
+        if len(healthy) == 1:
+            return healthy[0]
+        a, b = random.sample(healthy, 2)
+        return a if a.latency_ewma <= b.latency_ewma else b
+
+    def get_qrcode_image(self, ref_value: str, transaction_id: str) -> Optional[dict]:
+        """Create a transaction on the best endpoint, failing over on errors."""
+        tried = set()
+        for _ in range(len(self.endpoints)):
+            endpoint = self.choose(exclude=tried)
+            tried.add(endpoint.name)
+            resp = self._call(endpoint, "get_qrcode_image", get_qrcode_image,
+                              ref_value, endpoint.access_token, transaction_id,
+                              session=endpoint.session, url=endpoint.qrcode_url, timeout=self.timeout)
+            if resp is not None:
+                self.pin(resp.get("transactionId", transaction_id), endpoint)
+                return resp
+            if _last_response.status in _REQUEST_ERRORS:
+                # The verifier rejected the request itself (e.g. bad ref);
+                # another endpoint would not answer differently.
+                return None
+        return None
+
+    def get_verification_result(self, transaction_id: str):
+        """Look up a result on the endpoint that issued `transaction_id`."""
+        endpoint = self.endpoint_for(transaction_id)
+        return self._call(endpoint, "get_verification_result", get_verification_result,
+                          transaction_id, endpoint.access_token,
+                          session=endpoint.session, url=endpoint.result_url, timeout=self.timeout,
+                          healthy_statuses=(_RESULT_PENDING,))
+
+    def pin(self, transaction_id: str, endpoint: VerifierEndpoint):
+        self.pin_store.set("pin:" + transaction_id, endpoint.name, self.pin_ttl)
+
+    def endpoint_for(self, transaction_id: str) -> VerifierEndpoint:
+        """Pinned endpoint for the transaction, or the current best choice when unknown."""
+        name = self.pin_store.get("pin:" + transaction_id)
+        return self._by_name.get(name) or self.choose()
+
+    def snapshot(self) -> list:
+        return [ep.snapshot() for ep in self.endpoints]
+
+    def _call(self, endpoint: VerifierEndpoint, operation: str, fn, *args, healthy_statuses=(), **kwargs):
+        """
+        Call `fn` against `endpoint` and update its health: 2xx (and
+        `healthy_statuses`) count as success, request errors count as neither,
+        anything else (including no response) as a failure.
+        """
+        _last_response.status = None
+        started = time.monotonic()
+        with tracing.span(f"verifier.{operation}", kind="CLIENT", endpoint=endpoint.name) as span:
+            try:
+                result = fn(*args, extra_headers=tracing.propagation_headers(), **kwargs)
+            except Exception:
+                self._record(endpoint, ok=False, latency=time.monotonic() - started)
+                raise
+            status = _last_response.status
+            if span is not None:
+                span.set_tag("http.status_code", status)
+        ok = status is not None and (200 <= status < 300 or status in healthy_statuses)
+        if ok or status not in _REQUEST_ERRORS:
+            self._record(endpoint, ok=ok, latency=time.monotonic() - started)
+        return result
+
+    def _record(self, endpoint: VerifierEndpoint, ok: bool, latency: float):
+        with self._lock:
+            if ok:
+                # Fast failures (e.g. 401 from a bad token) must not make an
+                # endpoint look attractive, so only healthy replies feed the
+                # latency estimate.
+                if endpoint.latency_ewma is None:
+                    endpoint.latency_ewma = latency
+                else:
+                    endpoint.latency_ewma += _EWMA_ALPHA * (latency - endpoint.latency_ewma)
+                endpoint.consecutive_failures = 0
+                endpoint.ejections = 0
+                return
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.eject_after and endpoint.is_available(time.monotonic()):
+                endpoint.ejections += 1
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds * min(endpoint.ejections, 10)
+                endpoint.consecutive_failures = 0